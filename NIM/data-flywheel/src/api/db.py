@@ -53,6 +53,8 @@ def init_db():
     # Create indexes
     _db.flywheel_runs.create_index("workload_id")
     _db.flywheel_runs.create_index("started_at")
+    _db.flywheel_runs.create_index("dataset_content_hash")
+    _db.flywheel_runs.create_index("datasets.name")
 
     return _db
 
@@ -344,6 +344,37 @@ class TaskDBManager:
         """
         return self._flywheel_runs.find_one({"_id": ObjectId(job_id)})
 
+    def withdraw_datasets_from_reuse(self, flywheel_run_id: str | ObjectId) -> None:
+        """Stop offering the datasets of a flywheel run for reuse by new runs.
+
+        Runs reusing datasets re-check their source run after referencing the datasets,
+        so once this returns, is_dataset_shared sees every run that will keep them.
+
+        Args:
+            flywheel_run_id: ID of the flywheel run
+        """
+        self._flywheel_runs.update_one(
+            {"_id": ObjectId(flywheel_run_id)}, {"$unset": {"dataset_content_hash": ""}}
+        )
+
+    def is_dataset_shared(self, dataset_name: str, flywheel_run_id: str | ObjectId) -> bool:
+        """Check whether datasets reused by other flywheel runs include a dataset.
+
+        Args:
+            dataset_name: Name of the dataset
+            flywheel_run_id: ID of the flywheel run to exclude
+
+        Returns:
+            True if another flywheel run references the dataset, False otherwise
+        """
+        return (
+            self._flywheel_runs.count_documents(
+                {"datasets.name": dataset_name, "_id": {"$ne": ObjectId(flywheel_run_id)}},
+                limit=1,
+            )
+            > 0
+        )
+
     def find_running_flywheel_runs(self) -> list[Mapping[str, Any]]:
         """Find all flywheel runs that are currently running.
 
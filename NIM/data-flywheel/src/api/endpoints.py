@@ -14,7 +14,7 @@
 # limitations under the License.
 from datetime import datetime
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 
 from src.api.db import get_db
 from src.api.job_service import cancel_job, delete_job, get_job_details
@@ -28,7 +28,15 @@ from src.api.schemas import (
     JobRequest,
     JobResponse,
     JobsListResponse,
+    WorkloadCensusResponse,
+    WorkloadRecordsResponse,
 )
+from src.api.workload_service import (
+    check_workload_population,
+    get_workload_census,
+    preview_workload_records,
+)
+from src.config import settings
 from src.log_utils import setup_logging
 from src.tasks.tasks import run_nim_workflow_dag
 
@@ -47,6 +55,12 @@ async def create_job(request: JobRequest) -> JobResponse:
     entry = f"Request received at {current_time} for workload_id {request.workload_id} and client_id {request.client_id}"
     logger.info(entry)
 
+    # Reject under-populated workloads before any task is queued. A missing record
+    # index (404) or an unreachable Elasticsearch (503) is reported before the job is
+    # created, as its export would fail on the same error.
+    census = await get_workload_census(request.workload_id, request.client_id)
+    check_workload_population(census, request.data_split_config or settings.data_split_config)
+
     # Create FlywheelRun document
     flywheel_run = FlywheelRun(
         workload_id=request.workload_id,
@@ -132,3 +146,30 @@ async def cancel_job_endpoint(job_id: str) -> JobCancelResponse:
     Already finished jobs cannot be cancelled.
     """
     return cancel_job(job_id)
+
+
+@router.get("/workloads/{workload_id}/census", response_model=WorkloadCensusResponse)
+async def get_workload_census_endpoint(
+    workload_id: str,
+    client_id: str = Query(..., description="The unique identifier of the client"),
+) -> WorkloadCensusResponse:
+    """
+    Describe the records logged for a workload: record counts, date range,
+    tool-calling share and distinct tool signatures.
+
+    No records are transferred, so this can be used to check that a workload has
+    enough data before creating a job.
+    """
+    return await get_workload_census(workload_id, client_id)
+
+
+@router.get("/workloads/{workload_id}/records", response_model=WorkloadRecordsResponse)
+async def preview_workload_records_endpoint(
+    workload_id: str,
+    client_id: str = Query(..., description="The unique identifier of the client"),
+    size: int = Query(10, description="Number of records to return", ge=1, le=100),
+) -> WorkloadRecordsResponse:
+    """
+    Preview the newest records logged for a workload, with the fields the flywheel uses.
+    """
+    return await preview_workload_records(workload_id, client_id, size)
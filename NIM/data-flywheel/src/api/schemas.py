@@ -14,6 +14,7 @@
 # limitations under the License.
 from datetime import datetime
 from enum import Enum
+from typing import Any
 
 from pydantic import BaseModel, Field
 
@@ -390,3 +391,107 @@ class JobDetailResponse(BaseModel):
         description="Error message if the job failed",
         examples=["Job failed: Timeout"],
     )
+
+
+class ToolSignatureCount(BaseModel):
+    """Number of records calling a given set of tools."""
+
+    signature: str = Field(
+        ...,
+        description="Sorted, comma separated names of the called tools",
+        examples=["get_weather,search_flights"],
+    )
+    num_records: int = Field(..., description="Number of records", examples=[120], ge=0)
+
+
+class DailyRecordCount(BaseModel):
+    """Number of records logged on a given day."""
+
+    date: str = Field(..., description="Day of the bucket", examples=["2024-03-15T00:00:00.000Z"])
+    num_records: int = Field(..., description="Number of records", examples=[250], ge=0)
+
+
+class WorkloadCensusResponse(BaseModel):
+    """Response model describing the records logged for a workload."""
+
+    workload_id: str = Field(
+        ...,
+        description="The unique identifier of the workload",
+        examples=["workload_123"],
+    )
+    client_id: str = Field(
+        ...,
+        description="The unique identifier of the client",
+        examples=["client_123"],
+    )
+    num_records: int = Field(
+        ..., description="Number of records logged for the workload", examples=[5000], ge=0
+    )
+    num_fingerprinted_records: int = Field(
+        ...,
+        description="Number of records carrying the ingest-time fingerprints",
+        examples=[5000],
+        ge=0,
+    )
+    num_distinct_queries: int | None = Field(
+        ...,
+        description="Approximate number of distinct user queries, "
+        "None unless all records are fingerprinted",
+        examples=[4200],
+        ge=0,
+    )
+    first_record_at: datetime | None = Field(
+        None,
+        description="Timestamp of the oldest record",
+        examples=["2024-03-01T08:00:00Z"],
+    )
+    last_record_at: datetime | None = Field(
+        None,
+        description="Timestamp of the newest record",
+        examples=["2024-03-15T14:30:00Z"],
+    )
+    num_tool_calling_records: int | None = Field(
+        ...,
+        description="Number of records with tool calls, None unless all records are fingerprinted",
+        examples=[3000],
+        ge=0,
+    )
+    tool_calling_share: float | None = Field(
+        ...,
+        description="Share of records with tool calls, None unless all records are fingerprinted",
+        examples=[0.6],
+        ge=0,
+        le=1,
+    )
+    num_tool_signatures: int | None = Field(
+        ...,
+        description="Approximate number of distinct sets of called tools, "
+        "None unless all records are fingerprinted",
+        examples=[12],
+        ge=0,
+    )
+    tool_signatures: list[ToolSignatureCount] | None = Field(
+        default_factory=list,
+        description="Most frequent sets of called tools, None unless all records are fingerprinted",
+    )
+    records_per_day: list[DailyRecordCount] = Field(
+        default_factory=list, description="Number of records logged per day"
+    )
+
+
+class WorkloadRecordsResponse(BaseModel):
+    """Response model previewing the records logged for a workload."""
+
+    workload_id: str = Field(
+        ...,
+        description="The unique identifier of the workload",
+        examples=["workload_123"],
+    )
+    client_id: str = Field(
+        ...,
+        description="The unique identifier of the client",
+        examples=["client_123"],
+    )
+    records: list[dict[str, Any]] = Field(
+        default_factory=list, description="Newest records of the workload"
+    )
@@ -0,0 +1,113 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from elasticsearch import NotFoundError, TransportError
+from fastapi import HTTPException
+
+from src.api.schemas import WorkloadCensusResponse, WorkloadRecordsResponse
+from src.config import DataSplitConfig
+from src.lib.integration.es_client import ES_COLLECTION_NAME
+from src.lib.integration.record_exporter import AsyncRecordExporter
+from src.log_utils import setup_logging
+
+logger = setup_logging("data_flywheel.workload_service")
+
+
+async def get_workload_census(workload_id: str, client_id: str) -> WorkloadCensusResponse:
+    """
+    Describe the records logged for a workload using Elasticsearch aggregations.
+
+    Args:
+        workload_id: ID of the workload
+        client_id: ID of the client that logged the records
+
+    Returns:
+        WorkloadCensusResponse: Record counts, date range and tool usage of the workload
+
+    Raises:
+        HTTPException: 404 if the record index does not exist, 503 if Elasticsearch
+            cannot be reached, 500 if the census query fails otherwise
+    """
+    try:
+        census = await AsyncRecordExporter().get_workload_census(client_id, workload_id)
+    except NotFoundError as e:
+        error_msg = (
+            f"Failed to get the census of workload {workload_id}: Elasticsearch index "
+            f"{ES_COLLECTION_NAME} does not exist, no records have been logged yet"
+        )
+        logger.error(error_msg)
+        raise HTTPException(status_code=404, detail=error_msg) from e
+    except TransportError as e:
+        error_msg = (
+            f"Failed to get the census of workload {workload_id}: "
+            f"Elasticsearch is unavailable: {e!s}"
+        )
+        logger.error(error_msg)
+        raise HTTPException(status_code=503, detail=error_msg) from e
+    except Exception as e:
+        error_msg = f"Failed to get the census of workload {workload_id}: {e!s}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg) from e
+
+    return WorkloadCensusResponse(**census)
+
+
+async def preview_workload_records(
+    workload_id: str, client_id: str, size: int
+) -> WorkloadRecordsResponse:
+    """
+    Get the newest records logged for a workload.
+
+    Args:
+        workload_id: ID of the workload
+        client_id: ID of the client that logged the records
+        size: Number of records to return
+
+    Returns:
+        WorkloadRecordsResponse: The records, projected like exported records
+
+    Raises:
+        HTTPException: 500 if the query fails
+    """
+    try:
+        records = await AsyncRecordExporter().preview_records(client_id, workload_id, size)
+    except Exception as e:
+        error_msg = f"Failed to preview the records of workload {workload_id}: {e!s}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg) from e
+
+    return WorkloadRecordsResponse(workload_id=workload_id, client_id=client_id, records=records)
+
+
+def check_workload_population(
+    census: WorkloadCensusResponse, split_config: DataSplitConfig
+) -> None:
+    """
+    Reject a job up front when its workload cannot have enough records.
+
+    Validation can only drop records, so a workload logging fewer records than the
+    split configuration requires would fail in the create_datasets task anyway.
+
+    Raises:
+        HTTPException: 400 if the workload has too few records
+    """
+    required = max(split_config.min_total_records, split_config.eval_size)
+    if census.num_records < required:
+        msg = (
+            f"Not enough records found for workload {census.workload_id} "
+            f"and client {census.client_id}. A minimum of {required} records is required, "
+            f"but only {census.num_records} were found."
+        )
+        logger.error(msg)
+        raise HTTPException(status_code=400, detail=msg)
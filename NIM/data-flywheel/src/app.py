@@ -16,6 +16,7 @@ from fastapi import FastAPI
 
 from src.api.db import init_db
 from src.api.endpoints import router as api_router
+from src.lib.integration.es_client import close_async_es_client, init_async_es_client
 from src.lib.nemo.llm_as_judge import validate_llm_judge
 from src.log_utils import setup_logging
 
@@ -36,6 +37,17 @@ def startup_event():
     init_db()
 
 
+@app.on_event("startup")
+async def startup_elasticsearch():
+    # Shared async Elasticsearch connection pool for API-side record queries
+    await init_async_es_client()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_es_client()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -46,6 +46,95 @@ class DataSplitConfig(BaseModel):
     parse_function_arguments: bool = Field(
         default=True, description="Data Validation: Parse function arguments to JSON"
     )
+    near_duplicate_threshold: float | None = Field(
+        default=None,
+        description="Data Validation: Drop records whose user queries are near-duplicates "
+        "(estimated Jaccard similarity at or above this value), None disables it",
+        gt=0,
+        le=1,
+    )
+    stratify_by_tool: bool = Field(
+        default=False,
+        description="Data Split: Keep each tool's share of the records equal across the "
+        "eval, train and validation sets",
+    )
+
+
+class ExportConfig(BaseModel):
+    """Configuration for exporting records from Elasticsearch"""
+
+    page_size: int = Field(
+        default=1000,
+        description="Number of records fetched per search_after page",
+        gt=0,
+        le=10000,
+    )
+    pit_keep_alive: str = Field(
+        default="1m", description="How long the point-in-time snapshot is kept open between pages"
+    )
+    num_slices: int = Field(
+        default=1,
+        description="Number of point-in-time slices exported concurrently, 1 disables slicing",
+        ge=1,
+    )
+    source_includes: list[str] | None = Field(
+        default=None,
+        description="_source fields to export, None exports the fields the flywheel uses "
+        "and an empty list exports full documents",
+    )
+    source_excludes: list[str] = Field(
+        default_factory=list, description="_source fields to drop from the exported records"
+    )
+    sampling: Literal["recent", "random"] = Field(
+        default="recent",
+        description="Export the most recent records, or a server-side uniform random sample",
+    )
+    sample_oversampling: float = Field(
+        default=1.1,
+        description="Records sampled per requested record, to absorb records dropped in validation",
+        ge=1,
+    )
+    sample_time_buckets: int | None = Field(
+        default=None,
+        description="Stratify the random sample over this many equal-width time buckets",
+        gt=0,
+    )
+    snapshot_dir: str | None = Field(
+        default=None,
+        description="Directory for incremental per-workload record snapshots, None disables them. "
+        "Takes precedence over sampling",
+    )
+
+
+class ProcessingConfig(BaseModel):
+    """Configuration for the dataset creation stages"""
+
+    num_workers: int = Field(
+        default=1,
+        description="Worker processes for validation, formatting and serialisation, "
+        "1 runs everything in the calling process",
+        ge=1,
+    )
+    chunk_size: int = Field(
+        default=1000, description="Records handed to a worker process at a time", gt=0
+    )
+    start_method: Literal["spawn", "forkserver", "fork"] = Field(
+        default="spawn", description="multiprocessing start method of the worker processes"
+    )
+    spool_max_memory: int = Field(
+        default=64 * 1024 * 1024,
+        description="Bytes of a serialised dataset kept in memory before it is moved to a "
+        "temporary file for upload",
+        ge=0,
+    )
+    upload_concurrency: int = Field(
+        default=3, description="Datasets uploaded to the data store at the same time", ge=1
+    )
+    reuse_datasets: bool = Field(
+        default=True,
+        description="Reuse the datasets of an earlier run with the same records, data split "
+        "and ICL configuration instead of uploading them again",
+    )
 
 
 class ICLConfig(BaseModel):
@@ -55,6 +144,27 @@ class ICLConfig(BaseModel):
     reserved_tokens: int = Field(default=2048, description="Reserved tokens for ICL")
     max_examples: int = Field(default=3, description="Maximum examples for ICL")
     min_examples: int = Field(default=1, description="Minimum examples for ICL")
+    example_selection: Literal["shortest", "bm25"] = Field(
+        default="shortest",
+        description="Inject the shortest examples into every record, or retrieve the examples "
+        "most similar to each record's user query with BM25",
+    )
+    tokenizer_threads: int = Field(
+        default=4, description="Threads used to encode batches of texts when counting tokens", ge=1
+    )
+    token_count_cache_size: int = Field(
+        default=100_000, description="Token counts kept in the per-process LRU cache", gt=0
+    )
+    tokenizer_path: str | None = Field(
+        default=None,
+        description="NIM tokenizer.json (or its directory) used to count tokens instead of "
+        "cl100k_base, needs the tokenizers package",
+    )
+    tokenizer_cache_dir: str | None = Field(
+        default=None,
+        description="Local directory holding the tiktoken vocabulary files, for air-gapped "
+        "workers. TIKTOKEN_CACHE_DIR takes precedence when set",
+    )
 
 
 class LoRAConfig(BaseModel):
@@ -191,6 +301,8 @@ class Settings(BaseSettings):
     training_config: TrainingConfig
     data_split_config: DataSplitConfig
     icl_config: ICLConfig
+    export_config: ExportConfig = Field(default_factory=ExportConfig)
+    processing_config: ProcessingConfig = Field(default_factory=ProcessingConfig)
     logging_config: LoggingConfig = Field(default_factory=LoggingConfig)
 
     model_config = SettingsConfigDict(
@@ -221,6 +333,8 @@ class Settings(BaseSettings):
                 if "logging_config" in config_data
                 else LoggingConfig()
             )
+            export_config = ExportConfig(**(config_data.get("export_config") or {}))
+            processing_config = ProcessingConfig(**(config_data.get("processing_config") or {}))
 
             # Deduplicate NIMs by model_name
             # we should have only unique NIMs in the config
@@ -239,6 +353,8 @@ class Settings(BaseSettings):
                 training_config=training_config,
                 data_split_config=DataSplitConfig(**config_data["data_split_config"]),
                 icl_config=ICLConfig(**config_data["icl_config"]),
+                export_config=export_config,
+                processing_config=processing_config,
                 logging_config=logging_config,
             )
 
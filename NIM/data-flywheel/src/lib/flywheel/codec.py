@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""JSON codec used for record (de)serialisation throughout the flywheel.
+
+Uses orjson when it is installed (`pip install fbp[fast-json]`) and the standard
+library otherwise. Both backends produce the same compact, non-ASCII-escaped UTF-8
+JSON, so datasets and fingerprints are byte-identical whichever one is available:
+
+- floats are written in orjson's notation, decimal from 1e-5 up to 1e16 and with an
+  unpadded exponent otherwise (`0.00001`, `1e-7`, `1e+16`); the standard library
+  output is rewritten to match
+- NaN and Infinity are rejected with a ValueError by both backends
+- integers beyond 64 bits, which orjson rejects, are encoded by the standard library
+
+orjson releases before 3.12 write positive exponents without a sign and are ignored.
+"""
+
+import json
+import math
+import re
+from collections.abc import Iterable
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None and orjson.dumps(1e16) != b"1e+16":
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so this catches both backends
+JSONDecodeError = json.JSONDecodeError
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+_SEPARATORS = (",", ":")
+_NON_FINITE_MESSAGE = "Out of range float values are not JSON compliant"
+
+# A JSON string, or a float with a negative exponent written by the standard library
+_NEGATIVE_EXPONENT = re.compile(r'"(?:[^"\\]|\\.)*"|(-?)(\d)(?:\.(\d+))?e-(\d+)')
+
+
+def _orjson_float(match: re.Match[str]) -> str:
+    """Rewrite `1.5e-05` as `0.000015` and `1e-07` as `1e-7`, leaving strings alone."""
+    sign, leading, fraction, exponent = match.groups()
+    if leading is None:
+        return match.group()
+    if exponent == "05":
+        return f"{sign}0.0000{leading}{fraction or ''}"
+    mantissa = f"{leading}.{fraction}" if fraction else leading
+    return f"{sign}{mantissa}e-{int(exponent)}"
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool = False) -> str:
+    text = json.dumps(
+        obj, sort_keys=sort_keys, separators=_SEPARATORS, ensure_ascii=False, allow_nan=False
+    )
+    if "e-" in text:
+        text = _NEGATIVE_EXPONENT.sub(_orjson_float, text)
+    return text
+
+
+def _stdlib_dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+    return _stdlib_dumps(obj, sort_keys).encode("utf-8")
+
+
+def _check_finite(obj: Any) -> None:
+    """Reject NaN and Infinity, which orjson would write as null."""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list | tuple):
+            stack.extend(item)
+        elif isinstance(item, float) and not math.isfinite(item):
+            raise ValueError(_NON_FINITE_MESSAGE)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    _SORTED_OPTIONS = _OPTIONS | orjson.OPT_SORT_KEYS
+
+    def _orjson_dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+        try:
+            data = orjson.dumps(obj, option=_SORTED_OPTIONS if sort_keys else _OPTIONS)
+        except orjson.JSONEncodeError:
+            return _stdlib_dumpb(obj, sort_keys)
+        # Non-finite floats come out as null, so only documents with a null can hold one
+        if b"null" in data:
+            _check_finite(obj)
+        return data
+
+    def dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+        """Serialise an object to compact UTF-8 JSON bytes."""
+        return _orjson_dumpb(obj, sort_keys)
+
+    def dumps(obj: Any, sort_keys: bool = False) -> str:
+        """Serialise an object to a compact JSON string."""
+        return _orjson_dumpb(obj, sort_keys).decode("utf-8")
+
+    def loads(data: str | bytes) -> Any:
+        """Deserialise JSON from a string or UTF-8 bytes."""
+        return orjson.loads(data)
+
+else:
+
+    def dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+        """Serialise an object to compact UTF-8 JSON bytes."""
+        return _stdlib_dumpb(obj, sort_keys)
+
+    def dumps(obj: Any, sort_keys: bool = False) -> str:
+        """Serialise an object to a compact JSON string."""
+        return _stdlib_dumps(obj, sort_keys)
+
+    def loads(data: str | bytes) -> Any:
+        """Deserialise JSON from a string or UTF-8 bytes."""
+        return json.loads(data)
+
+
+def canonical_dumpb(obj: Any) -> bytes:
+    """Serialise an object to key-sorted UTF-8 JSON bytes, the input of fingerprints."""
+    return dumpb(obj, sort_keys=True)
+
+
+def dumps_jsonl(records: Iterable[Any]) -> bytes:
+    """Serialise records to JSONL bytes, one JSON document per line without a trailing newline."""
+    return b"\n".join(dumpb(record) for record in records)
@@ -0,0 +1,143 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import re
+from collections import Counter
+from typing import Any
+
+import numpy as np
+
+_TERM = re.compile(r"\w+")
+
+
+def query_terms(record: dict[str, Any]) -> list[str]:
+    """Lowercased word terms of the user messages of a record."""
+    try:
+        messages = record["request"]["messages"]
+    except (KeyError, TypeError):
+        return []
+    text = "\n".join(
+        str(msg["content"])
+        for msg in messages
+        if isinstance(msg, dict) and msg.get("role") == "user" and msg.get("content")
+    )
+    return _TERM.findall(text.lower())
+
+
+class BM25ExampleIndex:
+    """
+    In-memory BM25 index over the user queries of candidate ICL examples.
+
+    The index is stored as a sparse term-by-example matrix in compressed rows: for every
+    term the examples containing it and their precomputed BM25 weights. Scoring a query
+    concatenates the rows of its terms and sums them per example with one
+    `np.bincount`, so a lookup costs time proportional to the postings of the query
+    terms rather than to the number of examples.
+    """
+
+    def __init__(
+        self,
+        examples: list[tuple[dict[str, Any], str, int]],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.examples = examples
+        self.tokens = np.array([example[2] for example in examples], dtype=np.int64)
+
+        term_counts = [Counter(query_terms(example[0])) for example in examples]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float64)
+        average_length = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        for example_id, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                example_ids, term_frequencies = postings.setdefault(term, ([], []))
+                example_ids.append(example_id)
+                term_frequencies.append(count)
+
+        self._rows: dict[str, tuple[int, int]] = {}
+        all_ids: list[np.ndarray] = []
+        all_weights: list[np.ndarray] = []
+        offset = 0
+        num_examples = len(examples)
+        for term, (example_ids, term_frequencies) in postings.items():
+            ids = np.array(example_ids, dtype=np.int64)
+            tf = np.array(term_frequencies, dtype=np.float64)
+            idf = np.log1p((num_examples - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / average_length)
+            all_ids.append(ids)
+            all_weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            self._rows[term] = (offset, offset + len(ids))
+            offset += len(ids)
+
+        self._ids = np.concatenate(all_ids) if all_ids else np.empty(0, dtype=np.int64)
+        self._weights = np.concatenate(all_weights) if all_weights else np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def scores(self, terms: list[str]) -> np.ndarray:
+        """BM25 score of every example for a query."""
+        rows = [self._rows[term] for term in set(terms) if term in self._rows]
+        if not rows:
+            return np.zeros(len(self.examples))
+        ids = np.concatenate([self._ids[start:end] for start, end in rows])
+        weights = np.concatenate([self._weights[start:end] for start, end in rows])
+        return np.bincount(ids, weights=weights, minlength=len(self.examples))
+
+    def retrieve(
+        self, record: dict[str, Any], available_tokens: int, max_examples: int
+    ) -> list[tuple[dict[str, Any], str, int]]:
+        """
+        Retrieve the most relevant examples for a record within a token budget.
+
+        Examples are taken by descending BM25 score of the record's user query, shorter
+        examples first among equal scores, skipping examples that no longer fit, until
+        max_examples are selected.
+        """
+        return [
+            self.examples[example_id]
+            for example_id in self.retrieve_ids(record, available_tokens, max_examples)
+        ]
+
+    def retrieve_ids(
+        self, record: dict[str, Any], available_tokens: int, max_examples: int
+    ) -> list[int]:
+        """Like `retrieve`, but return the positions of the examples in `self.examples`."""
+        if available_tokens <= 0 or max_examples <= 0 or not self.examples:
+            return []
+
+        scores = self.scores(query_terms(record))
+        fits = np.flatnonzero(self.tokens <= available_tokens)
+        if not len(fits):
+            return []
+
+        # Only the best few candidates need ordering, more than max_examples because
+        # some of them may not fit together
+        num_candidates = min(len(fits), 4 * max_examples)
+        if num_candidates < len(fits):
+            top = np.argpartition(-scores[fits], num_candidates - 1)[:num_candidates]
+            fits = fits[top]
+        ranked = fits[np.lexsort((self.tokens[fits], -scores[fits]))]
+
+        selected = []
+        total_tokens = 0
+        for example_id in ranked.tolist():
+            example_tokens = int(self.tokens[example_id])
+            if total_tokens + example_tokens <= available_tokens:
+                selected.append(example_id)
+                total_tokens += example_tokens
+                if len(selected) == max_examples:
+                    break
+        return selected
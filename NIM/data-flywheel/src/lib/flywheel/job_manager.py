@@ -123,7 +123,14 @@ class FlywheelJobManager:
         Args:
             flywheel_run: The flywheel run containing dataset information
         """
+        # Datasets are reused across runs with the same content, keep them while
+        # another run still references them. No run may start reusing them once the
+        # sharing checks begin.
+        self.db_manager.withdraw_datasets_from_reuse(flywheel_run.id)
         for dataset in flywheel_run.datasets:
+            if self.db_manager.is_dataset_shared(dataset.name, flywheel_run.id):
+                logger.info(f"Keeping dataset {dataset.name}, used by another flywheel run")
+                continue
             try:
                 data_uploader = DataUploader(dataset_name=dataset.name)
                 data_uploader.delete_dataset()
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Index-based random sampling and splitting of record sets.
+
+Every function works on arrays of record positions and draws from its own NumPy
+`Generator` seeded with the configured seed, so results are reproducible for a seed
+and the global `random` state is never touched. Records are only materialised by
+`take`, once the final positions are known.
+"""
+
+from collections.abc import Sequence
+from typing import TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+def sample_indices(num_items: int, size: int, seed: int | None = None) -> np.ndarray:
+    """Positions of `size` items drawn without replacement, in random order."""
+    rng = np.random.default_rng(seed)
+    return rng.choice(num_items, size=min(size, num_items), replace=False)
+
+
+def split_indices(
+    num_items: int,
+    eval_size: int,
+    val_ratio: float,
+    seed: int | None = None,
+    strata: Sequence[str] | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Randomly split item positions into eval, train and validation sets.
+
+    The eval set takes `eval_size` items and the rest is divided into train and
+    validation by `val_ratio`. With `strata`, one label per item, each label is
+    represented in every set in proportion to its share of the items: the eval set is
+    allocated by largest remainder and each label's remaining items are split by
+    `val_ratio`. Within each set the items stay in random order.
+
+    Returns:
+        The positions of the eval, train and validation items
+    """
+    rng = np.random.default_rng(seed)
+    permutation = rng.permutation(num_items)
+    eval_size = min(eval_size, num_items)
+
+    if strata is None:
+        eval_end = eval_size
+        train_end = eval_end + int((num_items - eval_end) * (1 - val_ratio))
+        return (
+            permutation[:eval_end],
+            permutation[eval_end:train_end],
+            permutation[train_end:],
+        )
+
+    # Number the strata in order of first appearance
+    labels: dict[str, int] = {}
+    codes = np.fromiter(
+        (labels.setdefault(label, len(labels)) for label in strata),
+        dtype=np.int64,
+        count=num_items,
+    )[permutation]
+    counts = np.bincount(codes)
+
+    # Rank of every item among the items of its stratum, in permutation order
+    order = np.argsort(codes, kind="stable")
+    starts = np.cumsum(counts) - counts
+    ranks = np.empty(num_items, dtype=np.int64)
+    ranks[order] = np.arange(num_items) - starts[codes[order]]
+
+    # Eval quota per stratum: proportional shares rounded down, the remaining items go
+    # to the strata with the largest fractional parts
+    shares = counts * eval_size / max(num_items, 1)
+    eval_counts = np.floor(shares).astype(np.int64)
+    shortfall = eval_size - int(eval_counts.sum())
+    if shortfall:
+        eval_counts[np.argsort(eval_counts - shares, kind="stable")[:shortfall]] += 1
+    train_counts = ((counts - eval_counts) * (1 - val_ratio)).astype(np.int64)
+
+    is_eval = ranks < eval_counts[codes]
+    is_train = ~is_eval & (ranks < (eval_counts + train_counts)[codes])
+    is_val = ~is_eval & ~is_train
+    return permutation[is_eval], permutation[is_train], permutation[is_val]
+
+
+def take(items: Sequence[T], indices: np.ndarray) -> list[T]:
+    """Materialise the items at the given positions."""
+    return [items[i] for i in indices.tolist()]
@@ -0,0 +1,217 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from pathlib import Path
+
+import tiktoken
+
+from src.config import ICLConfig, settings
+from src.log_utils import setup_logging
+
+logger = setup_logging("data_flywheel.flywheel.tokenizer")
+
+ENCODING_NAME = "cl100k_base"
+# Seconds before loading a tokenizer is retried after every backend failed to load
+TOKENIZER_RETRY_SECONDS = 300
+
+
+def _approximate_counts(texts: list[str]) -> list[int]:
+    """
+    Approximate token counts without a vocabulary.
+
+    Uses the larger of the word count and one token per three characters, which
+    overestimates rather than underestimates typical BPE token counts, so ICL
+    contexts are underfilled rather than overflowing.
+    """
+    return [max(len(text.split()), (len(text) + 2) // 3) for text in texts]
+
+
+class TokenCounter:
+    """
+    Counts tokens with a tokenizer loaded once per process.
+
+    The tokenizer is, in order of preference:
+    - the NIM's own Hugging Face tokenizer (`icl_config.tokenizer_path`, a
+      tokenizer.json file or a directory containing one; needs the `tokenizers` package)
+    - tiktoken's cl100k_base encoding, read from `icl_config.tokenizer_cache_dir` when
+      set so that it loads without network access
+    - an approximation from the text length, logged as an error since it makes the
+      ICL context fitting unreliable; loading a tokenizer is retried every
+      TOKENIZER_RETRY_SECONDS
+
+    Counts are kept in an LRU cache keyed by a hash of the text, so repeated texts
+    (the same ICL examples, the same prompts) are encoded only once and the cache
+    does not hold on to the texts themselves. Approximated counts are never cached, so
+    exact counts take over as soon as a tokenizer loads. Batches of uncached texts are encoded
+    with the tokenizer's multi-threaded batch encoding.
+    """
+
+    def __init__(self, config: ICLConfig):
+        self.num_threads = config.tokenizer_threads
+        self.cache_size = config.token_count_cache_size
+        self.tokenizer_path = config.tokenizer_path
+        self.tokenizer_cache_dir = config.tokenizer_cache_dir
+        self.backend: str | None = None
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._encode: Callable[[list[str]], list[int]] | None = None
+        self._retry_at = 0.0
+
+    @property
+    def approximate(self) -> bool:
+        """Whether token counts are approximated because no tokenizer could be loaded."""
+        self._load()
+        return self._encode is _approximate_counts
+
+    def resolved_backend(self) -> str:
+        """The tokenizer counting tokens, loading it if needed, e.g. `cl100k_base`."""
+        self._load()
+        return self.backend
+
+    def warm_up(self) -> None:
+        """Load the tokenizer now rather than on the first count, e.g. at worker start."""
+        self._load()
+        self.count("Warming up the tokenizer.")
+        logger.info(f"Token counting uses the {self.backend} tokenizer")
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._encode is not None and (
+                self._encode is not _approximate_counts or time.monotonic() < self._retry_at
+            ):
+                return
+
+            encode = None
+            if self.tokenizer_path:
+                encode = self._load_hf_tokenizer(self.tokenizer_path)
+            if encode is None:
+                encode = self._load_tiktoken()
+            if encode is not None:
+                if self._encode is _approximate_counts:
+                    logger.info(f"Token counting recovered with the {self.backend} tokenizer")
+                self._encode = encode
+                return
+
+            self._retry_at = time.monotonic() + TOKENIZER_RETRY_SECONDS
+            if self._encode is None:
+                self.backend = "approximate"
+                self._encode = _approximate_counts
+                logger.error(
+                    "NO TOKENIZER AVAILABLE: token counts are APPROXIMATED from text length. "
+                    "ICL example fitting may be inaccurate. Provide the NIM tokenizer with "
+                    "icl_config.tokenizer_path, or populate icl_config.tokenizer_cache_dir "
+                    f"with the {ENCODING_NAME} encoding by running the warm-up once with "
+                    "network access."
+                )
+
+    def _load_hf_tokenizer(self, tokenizer_path: str) -> Callable[[list[str]], list[int]] | None:
+        path = Path(tokenizer_path)
+        if path.is_dir():
+            path = path / "tokenizer.json"
+        try:
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(str(path))
+        except Exception as e:
+            logger.error(f"Failed to load the NIM tokenizer from {path}: {e}")
+            return None
+
+        def encode(texts: list[str]) -> list[int]:
+            encoded = tokenizer.encode_batch(texts, add_special_tokens=False)
+            return [len(item.ids) for item in encoded]
+
+        self.backend = f"NIM ({path})"
+        return encode
+
+    def _load_tiktoken(self) -> Callable[[list[str]], list[int]] | None:
+        if self.tokenizer_cache_dir:
+            # tiktoken reads (and, when online, writes) its vocabulary files in the
+            # directory named by the environment. An operator's own setting applies
+            # to every tiktoken user of the process, so it takes precedence
+            cache_dir = os.environ.setdefault("TIKTOKEN_CACHE_DIR", self.tokenizer_cache_dir)
+            if cache_dir != self.tokenizer_cache_dir:
+                logger.warning(
+                    f"TIKTOKEN_CACHE_DIR is set to {cache_dir}, ignoring "
+                    f"icl_config.tokenizer_cache_dir {self.tokenizer_cache_dir}"
+                )
+        try:
+            encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            logger.error(f"Failed to load the {ENCODING_NAME} encoding: {e}")
+            return None
+
+        def encode(texts: list[str]) -> list[int]:
+            encoded = encoding.encode_batch(
+                texts, num_threads=self.num_threads, disallowed_special=()
+            )
+            return [len(item) for item in encoded]
+
+        self.backend = ENCODING_NAME
+        return encode
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a single text."""
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        """Count the tokens of many texts, encoding the uncached ones in one batch."""
+        self._load()
+        encode = self._encode
+        if encode is _approximate_counts:
+            return encode(list(texts))
+
+        keys = [self._key(text) for text in texts]
+        counts: list[int | None] = []
+        with self._lock:
+            for key in keys:
+                count = self._cache.get(key)
+                if count is not None:
+                    self._cache.move_to_end(key)
+                counts.append(count)
+
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            # Duplicates within the batch are encoded once
+            unique_texts = list({keys[i]: texts[i] for i in missing}.items())
+            encoded = encode([text for _, text in unique_texts])
+            new_counts = {key: count for (key, _), count in zip(unique_texts, encoded, strict=True)}
+
+            with self._lock:
+                for key, count in new_counts.items():
+                    self._cache[key] = count
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+            for i in missing:
+                counts[i] = new_counts[keys[i]]
+
+        return counts
+
+
+@lru_cache
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide token counter."""
+    return TokenCounter(settings.icl_config)
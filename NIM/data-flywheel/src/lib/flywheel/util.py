@@ -13,14 +13,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import json
-import random
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Sequence
 from copy import deepcopy
+from itertools import accumulate, islice, zip_longest
 from typing import Any, TypedDict
 
-import tiktoken
-
 from src.api.models import WorkloadClassification
 from src.config import DataSplitConfig, ICLConfig, settings
+from src.lib.flywheel import codec
+from src.lib.flywheel.icl_retrieval import BM25ExampleIndex
+from src.lib.flywheel.sampling import split_indices, take
+from src.lib.flywheel.tokenizer import get_token_counter
 from src.log_utils import setup_logging
 
 logger = setup_logging("data_flywheel.flywheel.util")
@@ -63,23 +68,31 @@ Here are some examples of how you should respond to different types of requests:
 
 def estimate_tokens(text: str, buffer_percent: int = 20) -> int:
     """Estimate tokens in text with a safety buffer."""
-    if not text:
-        return 0
+    return estimate_tokens_batch([text], buffer_percent)[0]
+
 
-    try:
-        encoding = tiktoken.get_encoding("cl100k_base")
-        token_count = len(encoding.encode(text))
-    except Exception:
-        # Fallback: Count words as a simple approximation of tokens
-        token_count = len(text.split())
+def estimate_tokens_batch(texts: Sequence[str], buffer_percent: int = 20) -> list[int]:
+    """Estimate tokens in many texts with a safety buffer, encoding them in one batch."""
+    non_empty = [text for text in texts if text]
+    counts = iter(get_token_counter().count_batch(non_empty) if non_empty else [])
 
-    # Add buffer percentage
-    buffer_tokens = (token_count * buffer_percent) // 100
-    return token_count + buffer_tokens
+    estimates = []
+    for text in texts:
+        token_count = next(counts) if text else 0
+        # Add buffer percentage
+        buffer_tokens = (token_count * buffer_percent) // 100
+        estimates.append(token_count + buffer_tokens)
+    return estimates
 
 
 def format_example(record: Record) -> tuple[str, int]:
     """Format a record into an example string and estimate its token count."""
+    example_str = format_example_string(record)
+    return example_str, estimate_tokens(example_str)
+
+
+def format_example_string(record: Record) -> str:
+    """Format a record into an example string."""
     request_messages = "".join(
         [f"{msg['role']}: {msg['content']}\n\n" for msg in record["request"]["messages"]]
     )
@@ -91,10 +104,7 @@ def format_example(record: Record) -> tuple[str, int]:
         tool_calls_str = json.dumps(resp["tool_calls"], indent=2)
         response_content += f"\nTool calls:\n{tool_calls_str}"
 
-    example_str = f"For example, if the conversation looks like this:\n{request_messages}\nThen you'll respond with:\n{response_content}"
-    token_count = estimate_tokens(example_str)
-
-    return example_str, token_count
+    return f"For example, if the conversation looks like this:\n{request_messages}\nThen you'll respond with:\n{response_content}"
 
 
 def uniform_bins(max_records: int, num_tools: int) -> list[int]:
@@ -119,6 +129,9 @@ def select_icl_examples(
     Select and organize ICL examples by tool groups with uniform binning for tool_calling records,
     or simple max_records selection for normal records.
     Returns binned tool groups for later round-robin fitting per record.
+
+    With `config.example_selection == "bm25"` all examples are kept, grouped by tool, as
+    candidates for per-record retrieval.
     """
     if not source_records:
         return {}
@@ -126,8 +139,12 @@ def select_icl_examples(
     # Step 1: Group records by tools and format examples
     tool_groups: dict[str, list[tuple[Record, str, int]]] = {}
 
-    for record in source_records:
-        example_str, token_count = format_example(record)
+    example_strs = [format_example_string(record) for record in source_records]
+    token_counts = estimate_tokens_batch(example_strs)
+
+    for record, example_str, token_count in zip(
+        source_records, example_strs, token_counts, strict=True
+    ):
         if not example_str:
             continue
 
@@ -142,6 +159,10 @@ def select_icl_examples(
         examples.sort(key=lambda x: x[2])
 
     # Step 3: Apply different selection logic based on workflow type
+    if config.example_selection == "bm25":
+        # Retrieval workflow: every example is a candidate, selected per record later
+        return tool_groups
+
     if workload_type == WorkloadClassification.TOOL_CALLING:
         # Tool calling workflow: Apply uniform binning to limit examples per tool
         if tool_groups:
@@ -167,6 +188,83 @@ def select_icl_examples(
     return tool_groups
 
 
+class ExampleSequence:
+    """
+    The ICL examples of all tool groups in round-robin order, with cumulative token counts.
+
+    Each tool group is sorted by token count and the round-robin order is fixed, so the
+    examples fitted into any token budget are always a prefix of this one sequence:
+    the longest prefix whose cumulative token count stays within the budget.
+    """
+
+    def __init__(self, tool_groups: dict[str, list[tuple[Record, str, int]]]):
+        self.examples: list[tuple[Record, str, int]] = [
+            example
+            for round_examples in zip_longest(*tool_groups.values())
+            for example in round_examples
+            if example is not None
+        ]
+        self.cumulative_tokens = list(accumulate(example[2] for example in self.examples))
+
+    def fit(self, available_tokens: int) -> int:
+        """Number of leading examples that fit into the token budget."""
+        if available_tokens <= 0:
+            return 0
+        return bisect_right(self.cumulative_tokens, available_tokens)
+
+    def tokens(self, num_examples: int) -> int:
+        """Total token count of the leading examples."""
+        return self.cumulative_tokens[num_examples - 1] if num_examples else 0
+
+
+class ICLPromptCache:
+    """
+    ICL system prompts interned by the set of fitted examples.
+
+    The examples block, prefixed with DEFAULT_SYSTEM_MESSAGE, is built once per distinct
+    set of examples (positions in `examples`), together with the system message inserted
+    into records without a system prompt of their own. Every record fitted with the same
+    examples then references the same string and message, which must therefore not be
+    modified in place.
+
+    With `max_size`, only the most recently used prompts are kept. Retrieved example
+    sets differ for almost every record, so an unbounded cache would hold one prompt
+    per record; fitted prefixes are bounded by the number of examples.
+    """
+
+    def __init__(self, examples: Sequence[tuple[Record, str, int]], max_size: int | None = None):
+        self.examples = examples
+        self.max_size = max_size
+        self.num_built = 0
+        self._prompts: OrderedDict[tuple[int, ...], tuple[str, Message]] = OrderedDict()
+
+    def _get(self, example_ids: tuple[int, ...]) -> tuple[str, Message]:
+        prompt = self._prompts.get(example_ids)
+        if prompt is not None:
+            self._prompts.move_to_end(example_ids)
+            return prompt
+
+        examples_block = "\n\n".join(self.examples[i][1] for i in example_ids)
+        header = f"{DEFAULT_SYSTEM_MESSAGE.strip()}\n\n{examples_block}"
+        prompt = (header, {"role": "system", "content": header})
+        self._prompts[example_ids] = prompt
+        self.num_built += 1
+        if self.max_size is not None and len(self._prompts) > self.max_size:
+            self._prompts.popitem(last=False)
+        return prompt
+
+    def header(self, example_ids: tuple[int, ...]) -> str:
+        """The default system message followed by the examples block."""
+        return self._get(example_ids)[0]
+
+    def system_message(self, example_ids: tuple[int, ...]) -> Message:
+        """The shared system message for records without a system prompt."""
+        return self._get(example_ids)[1]
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+
 def fit_examples_for_record(
     tool_groups: dict[str, list[tuple[Record, str, int]]],
     available_tokens: int,
@@ -183,103 +281,140 @@ def fit_examples_for_record(
             we try to fit as many examples as possible for each record, but we don't want to exceed the max context length.
     For Generic workload:
             we try to fit as many examples as possible for each record, but we don't want to exceed the max examples.
+
+    To fit many records against the same tool groups, build an ExampleSequence once
+    and use its fit method instead.
     """
     if not tool_groups or available_tokens <= 0:
         return []
 
-    tool_names = list(tool_groups.keys())
+    sequence = ExampleSequence(tool_groups)
+    return sequence.examples[: sequence.fit(available_tokens)]
 
-    # Round-robin selection with token checking
-    selected_examples: list[tuple[Record, str, int]] = []
-    tool_indices = {tool: 0 for tool in tool_names}
-    total_tokens = 0
 
-    # Calculate maximum possible iterations based on available examples
-    max_examples_per_tool = (
-        max(len(examples) for examples in tool_groups.values()) if tool_groups else 0
-    )
+# Number of records whose token counts are estimated in one batch while streaming
+ICL_TOKEN_BATCH_SIZE = 1024
+# Number of retrieved ICL system prompts kept for reuse while streaming
+ICL_PROMPT_CACHE_SIZE = 256
 
-    for _ in range(max_examples_per_tool):
-        for tool_name in tool_names:
-            # Check if this tool has more examples available
-            if tool_indices[tool_name] < len(tool_groups[tool_name]):
-                example = tool_groups[tool_name][tool_indices[tool_name]]
 
-                # Check if adding this example exceeds token limit
-                if total_tokens + example[2] <= available_tokens:
-                    selected_examples.append(example)
-                    total_tokens += example[2]
-                    tool_indices[tool_name] += 1
-                else:
-                    # Stop if tokens run out
-                    return selected_examples
+def _with_system_prompt(
+    record: Record, prompts: ICLPromptCache, example_ids: tuple[int, ...]
+) -> Record:
+    """
+    Return a copy of a record with the ICL examples injected into its system prompt.
 
-    return selected_examples
+    Only the containers on the path to the first message, and that message when it is
+    rewritten, are copied; everything else is shared with the original record, and the
+    prompt itself is shared through the prompt cache.
+    """
+    messages = record["request"]["messages"]
+    first_message = messages[0]
+    if first_message["role"] == "system":
+        system_message = {
+            **first_message,
+            "content": f"{prompts.header(example_ids)}\n\n{first_message['content']}",
+        }
+        new_messages = [system_message, *messages[1:]]
+    else:
+        new_messages = [prompts.system_message(example_ids), *messages]
+    return {**record, "request": {**record["request"], "messages": new_messages}}
 
 
-def generate_icl_records(
-    records: list[Record],
+def iter_icl_records(
+    records: Iterable[Record],
     config: ICLConfig = settings.icl_config,
     selected_examples: dict[str, list[tuple[Record, str, int]]] | None = None,
-) -> list[Record]:
-    """Generate ICL records with per-record round-robin fitting and token checking."""
-    if not records:
-        return []
+) -> Iterator[Record]:
+    """
+    Lazily generate ICL records with per-record round-robin fitting and token checking.
 
+    With `config.example_selection == "bm25"` each record instead gets the examples most
+    similar to its user query that fit its token budget, up to `config.max_examples`.
+
+    The input records are not modified: each yielded record is a shallow copy sharing
+    everything but its rewritten system message with the input record, or the input
+    record itself when no examples fit. Token counts are estimated in batches of
+    ICL_TOKEN_BATCH_SIZE records, and the injection summary is logged once the
+    generator is exhausted.
+    """
     # If selected_examples is None, select examples from the same records
     if selected_examples is None:
+        records = list(records)
+        if not records:
+            return
         workload_type = identify_workload_type(records)
         selected_examples = select_icl_examples(records, config, workload_type)
 
     # Inject ICL examples into each target record with per-record fitting
-    result = deepcopy(records)
+    sequence = ExampleSequence(selected_examples)
+    retriever = (
+        BM25ExampleIndex([example for group in selected_examples.values() for example in group])
+        if config.example_selection == "bm25"
+        else None
+    )
+    prompts = (
+        ICLPromptCache(retriever.examples, max_size=ICL_PROMPT_CACHE_SIZE)
+        if retriever is not None
+        else ICLPromptCache(sequence.examples)
+    )
     remaining_cnts = []
+    num_records = 0
 
-    for record in result:
-        # Calculate available tokens for this specific record
-        record_tokens = estimate_tokens(json.dumps(record))
-        available_tokens = config.max_context_length - config.reserved_tokens - record_tokens
+    records_iter = iter(records)
+    while batch := list(islice(records_iter, ICL_TOKEN_BATCH_SIZE)):
+        all_record_tokens = estimate_tokens_batch([codec.dumps(record) for record in batch])
 
-        if available_tokens <= 0:
-            continue  # Skip if there are NOT enough tokens
-
-        # Fit examples for this record using round-robin with token checking
-        fitted_examples = fit_examples_for_record(selected_examples, available_tokens)
-        example_tokens = sum(ex[2] for ex in fitted_examples)
-        remaining_cnts.append(
-            (
-                example_tokens,
-                len(fitted_examples),
-                available_tokens - example_tokens,
-            )
-        )
-        if not fitted_examples:
-            continue  # No examples fit
-
-        # Create system message with fitted examples
-        example_strings = [ex[1] for ex in fitted_examples]
-        concatenated_string = "\n\n".join(example_strings)
-
-        if example_tokens <= available_tokens:
-            first_message = record["request"]["messages"][0]
-            if first_message["role"] == "system":
-                first_message["content"] = (
-                    f"{DEFAULT_SYSTEM_MESSAGE.strip()}\n\n"
-                    f"{concatenated_string}\n\n"
-                    f"{first_message['content']}"
+        for record, record_tokens in zip(batch, all_record_tokens, strict=True):
+            num_records += 1
+            # Calculate available tokens for this specific record
+            available_tokens = config.max_context_length - config.reserved_tokens - record_tokens
+
+            if available_tokens <= 0:
+                yield record  # Skip if there are NOT enough tokens
+                continue
+
+            if retriever is not None:
+                # Retrieve the most similar examples that fit the budget
+                example_ids = tuple(
+                    retriever.retrieve_ids(record, available_tokens, config.max_examples)
                 )
+                num_fitted = len(example_ids)
+                example_tokens = sum(retriever.examples[i][2] for i in example_ids)
             else:
-                system_message: Message = {
-                    "role": "system",
-                    "content": f"{DEFAULT_SYSTEM_MESSAGE.strip()}\n\n{concatenated_string}",
-                }
-                record["request"]["messages"].insert(0, system_message)
+                # Fit examples for this record: the longest round-robin prefix within the budget
+                num_fitted = sequence.fit(available_tokens)
+                example_tokens = sequence.tokens(num_fitted)
+                example_ids = tuple(range(num_fitted))
+            remaining_cnts.append(
+                (
+                    example_tokens,
+                    num_fitted,
+                    available_tokens - example_tokens,
+                )
+            )
+            if not num_fitted or example_tokens > available_tokens:
+                yield record  # No examples fit
+                continue
+
+            # Create system message with fitted examples
+            yield _with_system_prompt(record, prompts, example_ids)
+
+    _log_icl_summary(config, num_records, remaining_cnts)
+    logger.info(f"Built {prompts.num_built} ICL system prompts for {num_records} records")
+
+
+def _log_icl_summary(
+    config: ICLConfig, num_records: int, remaining_cnts: list[tuple[int, int, int]]
+) -> None:
     logger.info("ICL Injection Done")
     logger.info("-------------------------------------------------")
-    logger.info(f"Total ICL Eval Dataset Size: {len(result)}.")
+    logger.info(f"Total ICL Eval Dataset Size: {num_records}.")
     logger.info(f"Total Max Context Length: {config.max_context_length}.")
     logger.info(f"Total Reserved Tokens: {config.reserved_tokens}.")
     logger.info(f"Tried to fit max_examples={config.max_examples} examples per record")
+    if get_token_counter().approximate:
+        logger.warning("Token counts were APPROXIMATED, the ICL examples may not fit the context")
     if len(remaining_cnts) > 0:
         logger.info(
             f"On Average Injected {sum(cnt[1] for cnt in remaining_cnts) / len(remaining_cnts)} examples per record"
@@ -294,7 +429,31 @@ def generate_icl_records(
         logger.info("No examples were injected")
 
     logger.info("-------------------------------------------------")
-    return result
+
+
+def iter_icl_jsonl(
+    records: Iterable[Record],
+    config: ICLConfig = settings.icl_config,
+    selected_examples: dict[str, list[tuple[Record, str, int]]] | None = None,
+) -> Iterator[bytes]:
+    """
+    Lazily generate ICL records as JSONL lines (without line terminators).
+
+    Only one ICL record is alive at a time. The records are serialised as they are, so
+    records meant for evaluation should already have been passed through
+    `format_evaluator`; the injected system message has no tool calls to format.
+    """
+    for record in iter_icl_records(records, config, selected_examples):
+        yield codec.dumpb(record)
+
+
+def generate_icl_records(
+    records: list[Record],
+    config: ICLConfig = settings.icl_config,
+    selected_examples: dict[str, list[tuple[Record, str, int]]] | None = None,
+) -> list[Record]:
+    """Generate ICL records with per-record round-robin fitting and token checking."""
+    return list(iter_icl_records(records, config, selected_examples))
 
 
 def identify_workload_type(records: list[Record]) -> WorkloadClassification:
@@ -343,7 +502,7 @@ def format_evaluator(records: list[Record]) -> list[Record]:
                             # Convert arguments to JSON string if they're currently an object
                             if isinstance(arguments, dict):
                                 try:
-                                    tool_call["function"]["arguments"] = json.dumps(arguments)
+                                    tool_call["function"]["arguments"] = codec.dumps(arguments)
                                 except (TypeError, ValueError) as e:
                                     logger.warning(
                                         f"Failed to serialize tool call arguments: {arguments}, error: {e}"
@@ -358,25 +517,29 @@ def format_evaluator(records: list[Record]) -> list[Record]:
 def split_records(
     records: list[Record], split_config: DataSplitConfig
 ) -> tuple[list[Record], list[Record], list[Record]]:
-    """Split records into eval, train and validation sets."""
-
-    if split_config.random_seed is not None:
-        random.seed(split_config.random_seed)
-
-    # Create indices list once and shuffle it
-    indices = list(range(len(records)))
-    random.shuffle(indices)
-
-    # Split indices directly into three parts
-    eval_end = split_config.eval_size
-    train_end = eval_end + int((len(indices) - eval_end) * (1 - split_config.val_ratio))
+    """
+    Split records into eval, train and validation sets.
 
-    # Use the shuffled indices to get the records in one pass
-    eval_records = [records[i] for i in indices[:eval_end]]
-    train_records = [records[i] for i in indices[eval_end:train_end]]
-    val_records = [records[i] for i in indices[train_end:]]
+    With `split_config.stratify_by_tool` every tool name (see `get_tool_name`) keeps
+    its share of the records in each set.
+    """
+    strata = (
+        [get_tool_name(record) for record in records] if split_config.stratify_by_tool else None
+    )
+    eval_indices, train_indices, val_indices = split_indices(
+        len(records),
+        split_config.eval_size,
+        split_config.val_ratio,
+        seed=split_config.random_seed,
+        strata=strata,
+    )
 
-    return eval_records, train_records, val_records
+    # Use the split positions to get the records in one pass
+    return (
+        take(records, eval_indices),
+        take(records, train_indices),
+        take(records, val_indices),
+    )
 
 
 def format_training_data(
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import multiprocessing
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TypeVar
+
+import billiard
+from billiard.pool import Pool as BilliardPool
+
+from src.config import ProcessingConfig, settings
+from src.log_utils import setup_logging
+
+logger = setup_logging("data_flywheel.chunked_executor")
+
+T = TypeVar("T")
+
+
+class ChunkedExecutor:
+    """
+    Runs CPU-bound functions over lists of records, optionally on a process pool.
+
+    With `num_workers > 1` the records are cut into consecutive chunks of `chunk_size`
+    that are processed by worker processes; the per-chunk results are always returned
+    in chunk order, so merging them gives the same result as a serial run and seeded
+    splits stay reproducible. Functions must be module-level (picklable) and take the
+    chunk as their first argument.
+
+    The pool is started lazily on first use and shut down by `close()` or when used as
+    a context manager. Daemonic processes, such as Celery prefork workers, may not
+    start children with `multiprocessing`; there the pool is a `billiard` pool, Celery's
+    own fork of `multiprocessing`, which allows it.
+    """
+
+    def __init__(self, config: ProcessingConfig | None = None):
+        self.config = config or settings.processing_config
+        self._pool: ProcessPoolExecutor | BilliardPool | None = None
+        self._serial = self.config.num_workers <= 1
+        self._daemonic = multiprocessing.current_process().daemon
+
+    @property
+    def parallel(self) -> bool:
+        """Whether chunks are processed on worker processes."""
+        return not self._serial
+
+    def __enter__(self) -> "ChunkedExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the worker processes, if they were started."""
+        if isinstance(self._pool, BilliardPool):
+            self._pool.close()
+            self._pool.join()
+        elif self._pool is not None:
+            self._pool.shutdown()
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor | BilliardPool:
+        if self._pool is None:
+            logger.info(
+                f"Starting {self.config.num_workers} worker processes "
+                f"({self.config.start_method}"
+                f"{', billiard' if self._daemonic else ''}) for dataset processing"
+            )
+            if self._daemonic:
+                self._pool = billiard.get_context(self.config.start_method).Pool(
+                    processes=self.config.num_workers
+                )
+            else:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.config.num_workers,
+                    mp_context=multiprocessing.get_context(self.config.start_method),
+                )
+        return self._pool
+
+    def _submit(self, fn: Callable[..., T], chunk: list[Any], *args: Any) -> Callable[[], T]:
+        """Schedule `fn(chunk, *args)` on the pool, returns a call waiting for its result."""
+        pool = self._get_pool()
+        if isinstance(pool, BilliardPool):
+            return pool.apply_async(fn, (chunk, *args)).get
+        return pool.submit(fn, chunk, *args).result
+
+    def map(self, fn: Callable[..., T], items: list[Any], *args: Any) -> list[T]:
+        """
+        Apply `fn(chunk, *args)` to consecutive chunks of `items`.
+
+        Returns:
+            The result of each chunk, in chunk order. When running serially, or when the
+            items fit in one chunk, `fn` is called once in this process on all items.
+        """
+        return list(self.imap(fn, items, *args))
+
+    def imap(self, fn: Callable[..., T], items: list[Any], *args: Any) -> Iterator[T]:
+        """Like `map`, but yield each chunk result as soon as it and its predecessors are done."""
+        chunk_size = self.config.chunk_size
+        if self._serial or len(items) <= chunk_size:
+            yield fn(items, *args)
+            return
+
+        results = [
+            self._submit(fn, items[start : start + chunk_size], *args)
+            for start in range(0, len(items), chunk_size)
+        ]
+        for result in results:
+            yield result()
+
+    def map_records(self, fn: Callable[..., list[T]], records: list[Any], *args: Any) -> list[T]:
+        """Apply a list-to-list function `fn(chunk, *args)` chunk-wise and concatenate the results."""
+        results: list[T] = []
+        for chunk_result in self.map(fn, records, *args):
+            results.extend(chunk_result)
+        return results
@@ -12,16 +12,68 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import random
+from collections.abc import Iterable, Iterator, Sized
 from typing import Any
 
 from src.api.models import WorkloadClassification
 from src.config import DataSplitConfig, settings
-from src.lib.integration.openai_format_validator import OpenAIFormatValidator
+from src.lib.flywheel.sampling import sample_indices, take
+from src.lib.integration.chunked_executor import ChunkedExecutor
+from src.lib.integration.near_duplicates import NearDuplicateIndex, get_query_text
+from src.lib.integration.openai_format_validator import (
+    REMOVED_QUALITY_FILTERS,
+    OpenAIFormatValidator,
+)
+from src.lib.integration.record_fingerprint import get_query_hash
 from src.log_utils import setup_logging
 
 logger = setup_logging("data_flywheel.data_validator")
 
+# validation_stats keys counting the rejected records per failing field
+FIELD_FAILURE_PREFIX = "failed:"
+
+
+def _iter_checked_records(
+    validator: OpenAIFormatValidator,
+    records: Iterable[dict[str, Any]],
+    is_tool_calling: bool,
+    parse_arguments: bool,
+    stats: dict[str, int],
+) -> Iterator[dict[str, Any]]:
+    """Yield the records passing the format and quality checks, counting into stats."""
+    for record in records:
+        stats["total_records"] += 1
+
+        failure = validator.validate_record(record, is_tool_calling, parse_arguments)
+        if failure is None:
+            stats["valid_openai_format"] += 1
+            yield record
+            continue
+
+        if failure.kind == REMOVED_QUALITY_FILTERS:
+            stats["valid_openai_format"] += 1
+        stats[failure.kind] += 1
+        field_key = FIELD_FAILURE_PREFIX + failure.field
+        stats[field_key] = stats.get(field_key, 0) + 1
+
+
+def _check_records_chunk(
+    records: list[dict[str, Any]], is_tool_calling: bool, parse_arguments: bool
+) -> tuple[list[dict[str, Any]], dict[str, int]]:
+    """Run the per-record checks over a chunk of records in a worker process."""
+    stats = {
+        "total_records": 0,
+        "valid_openai_format": 0,
+        "invalid_format": 0,
+        "removed_quality_filters": 0,
+    }
+    checked = list(
+        _iter_checked_records(
+            OpenAIFormatValidator(), records, is_tool_calling, parse_arguments, stats
+        )
+    )
+    return checked, stats
+
 
 class DataValidator:
     """Handles validation of dataset records according to OpenAI format and quality filters."""
@@ -33,6 +85,7 @@ class DataValidator:
             "invalid_format": 0,
             "removed_quality_filters": 0,
             "deduplicated_queries": 0,
+            "near_duplicate_queries": 0,
             "final_selected": 0,
         }
         self.openai_validator = OpenAIFormatValidator()
@@ -69,23 +122,27 @@ class DataValidator:
 
     def validate_records(
         self,
-        records: list[dict[str, Any]],
+        records: Iterable[dict[str, Any]],
         workload_type: WorkloadClassification,
         split_config: DataSplitConfig,
+        executor: ChunkedExecutor | None = None,
     ) -> list[dict[str, Any]]:
         """
         Validate and process records according to requirements.
         Flow:
         1. Validate OpenAI format
         2. Apply quality filters based on workload type
-        3. Remove duplicates
+        3. Remove duplicates, and near-duplicates when near_duplicate_threshold is set
         4. Select required number of records
 
+        Steps 1-3 run fused in a single pass over the records (see iter_valid_records),
+        so records can be streamed straight from the exporter.
+
         Args:
-            records: List of records to validate
+            records: Records to validate, a list or any iterable
             workload_type: Type of workload (GENERIC or TOOL_CALLING)
-            limit: Maximum number of records to return
-            min_records: Minimum number of records to return
+            split_config: Data split configuration (limit, min_total_records, eval_size)
+            executor: Optional executor to run the per-record checks on worker processes
 
         Returns:
             List of validated records
@@ -109,177 +166,164 @@ class DataValidator:
             if split_config.eval_size is not None
             else settings.data_split_config.eval_size
         )
+        near_duplicate_threshold = (
+            split_config.near_duplicate_threshold
+            if split_config.near_duplicate_threshold is not None
+            else settings.data_split_config.near_duplicate_threshold
+        )
+        random_seed = (
+            split_config.random_seed
+            if split_config.random_seed is not None
+            else settings.data_split_config.random_seed
+        )
 
-        self.validation_stats["total_records"] = len(records)
         logger.info(
-            f"Starting validation of {len(records)} records with limit={limit}, \
+            f"Starting validation with limit={limit}, \
                 min_records={min_records},  \
                 workload_type={workload_type}"
         )
 
-        # Step 1: Validate record count
-        self.validate_records_count(len(records), min_records, eval_size, limit)
+        # Step 1: Validate record count, up front when the number of records is known
+        if isinstance(records, Sized):
+            self.validate_records_count(len(records), min_records, eval_size, limit)
 
-        # Step 2: Validate OpenAI format
-        valid_openai_records = []
-        invalid_records = []
+        # Steps 2-4: Validate OpenAI format, apply quality filters and remove duplicates
+        deduplicated_records = list(
+            self.iter_valid_records(records, workload_type, executor, near_duplicate_threshold)
+        )
 
-        for record in records:
-            if self.openai_validator.validate_chat_completion_format(record):
-                valid_openai_records.append(record)
-            else:
-                invalid_records.append(record)
-                self.validation_stats["invalid_format"] += 1
+        stats = self.validation_stats
+        if not isinstance(records, Sized):
+            self.validate_records_count(stats["total_records"], min_records, eval_size, limit)
 
-        self.validation_stats["valid_openai_format"] = len(valid_openai_records)
+        num_filtered = stats["valid_openai_format"] - stats["removed_quality_filters"]
         logger.info(
-            f"Found {len(valid_openai_records)} records in valid OpenAI format, {len(invalid_records)} invalid"
+            f"Found {stats['valid_openai_format']} records in valid OpenAI format, {stats['invalid_format']} invalid"
         )
-
-        # Step 3: Apply quality filters based on workload type
-        if workload_type == WorkloadClassification.TOOL_CALLING:
-            filtered_records = self.get_tool_calling_records(valid_openai_records)
-        else:
-            filtered_records = valid_openai_records
-
-        logger.info(f"After quality filters: {len(filtered_records)} records remain")
-
-        # Step 4: Remove duplicates
-        deduplicated_records = self._deduplicate_records(filtered_records)
+        logger.info(f"After quality filters: {num_filtered} records remain")
         logger.info(f"After deduplication: {len(deduplicated_records)} records remain")
 
         # Step 5: Check if we have enough records
         if len(deduplicated_records) < min_records:
             raise ValueError(
                 f"Insufficient valid records. Found {len(deduplicated_records)} but need {min_records}. "
-                f"Total records: {len(records)}, valid OpenAI format: {len(valid_openai_records)}, "
-                f"after quality filters: {len(filtered_records)}. "
+                f"Total records: {stats['total_records']}, valid OpenAI format: {stats['valid_openai_format']}, "
+                f"after quality filters: {num_filtered}. "
                 f"Please provide more valid records."
             )
 
         # Step 6: Random selection
-        if settings.data_split_config.random_seed:
-            random.seed(settings.data_split_config.random_seed)
-
         # if limit is not set then limit=len(deduplicated_records)
         # else limit=min(limit, len(deduplicated_records)) to avoid random sampling error
         limit = (
             len(deduplicated_records) if limit is None else min(limit, len(deduplicated_records))
         )
-        selected_records = random.sample(deduplicated_records, limit)
+        selected_records = take(
+            deduplicated_records,
+            sample_indices(len(deduplicated_records), limit, seed=random_seed),
+        )
 
         self.validation_stats["final_selected"] = len(selected_records)
         self._log_validation_stats()
 
         return selected_records
 
-    def get_tool_calling_records(self, records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    def iter_valid_records(
+        self,
+        records: Iterable[dict[str, Any]],
+        workload_type: WorkloadClassification,
+        executor: ChunkedExecutor | None = None,
+        near_duplicate_threshold: float | None = None,
+    ) -> Iterator[dict[str, Any]]:
         """
-        Get tool calling records from a list of records.
-
-        Steps:
-        1. Validate tool calling quality
-            Checks for structure:
-                "response":
-                    "choices": [
-                        "message": {
-                            "tool_calls": [
-                            {
-                                "function": {
-                                    "arguments": "..."
-                                }
-                            }
-                        ]
-                    ]
-        2. Parse function arguments to JSON objects for tool calling records
-            If responses.choices.message.tool_calls.function.arguments is a string, parse it to a JSON object
+        Validate, filter, parse and deduplicate records in a single pass.
 
-        Returns:
-            List of records that pass the tool calling quality filters
+        Each record goes through the OpenAI format check, the tool calling quality
+        filters (including function argument parsing) for tool calling workloads and
+        query deduplication as soon as it arrives, and is yielded if it passes all of
+        them. The validation_stats counters are updated along the way.
+
+        With a parallel executor and a list of records, the per-record checks run
+        chunk-wise on its worker processes and only deduplication runs here, over the
+        checked records in their original order.
+
+        With a near_duplicate_threshold, records whose user queries are near-duplicates
+        of an earlier record's (see NearDuplicateIndex) are dropped after the exact
+        deduplication and counted as near_duplicate_queries.
 
         Args:
-            records: List of records to validate
+            records: Records to validate, in export order
+            workload_type: Type of workload (GENERIC or TOOL_CALLING)
+            executor: Optional executor for the per-record checks
+            near_duplicate_threshold: Similarity threshold for near-duplicate removal,
+                None only removes exact duplicates
 
+        Yields:
+            Records that passed all checks, first occurrence of each query only
         """
-        filtered_records = []
-        for record in records:
-            if self.openai_validator.validate_tool_calling_quality(record):
-                filtered_records.append(record)
-            else:
-                self.validation_stats["removed_quality_filters"] += 1
-
-        logger.info(f"After quality filters: {len(filtered_records)} records remain")
-
-        # Parse function arguments to JSON objects for tool calling records
-        if settings.data_split_config.parse_function_arguments:
-            parsed_records = []
-            for record in filtered_records:
-                if self.openai_validator._parse_function_arguments_to_json(record):
-                    # Keep records where parsing succeeded
-                    parsed_records.append(record)
-                else:
-                    # Drop records where parsing failed
-                    self.validation_stats["removed_quality_filters"] += 1
-
-            logger.info(f"After JSON parsing: {len(parsed_records)} records remain")
-            return parsed_records
-
-        return filtered_records
-
-    def _deduplicate_records(self, records: list[dict[str, Any]]) -> list[dict[str, Any]]:
-        """
-        Remove duplicate records based on user queries.
+        stats = self.validation_stats
+        is_tool_calling = workload_type == WorkloadClassification.TOOL_CALLING
+        parse_arguments = settings.data_split_config.parse_function_arguments
+
+        if executor is not None and executor.parallel and isinstance(records, list):
+            checked_records: list[dict[str, Any]] = []
+            for chunk_records, chunk_stats in executor.map(
+                _check_records_chunk, records, is_tool_calling, parse_arguments
+            ):
+                checked_records.extend(chunk_records)
+                for key, count in chunk_stats.items():
+                    stats[key] = stats.get(key, 0) + count
+        else:
+            checked_records = _iter_checked_records(
+                self.openai_validator, records, is_tool_calling, parse_arguments, stats
+            )
 
-        This method identifies duplicates by looking at all user messages in each record.
-        Records with identical user queries are considered duplicates.
+        seen_queries: set[str] = set()
+        unique_records = (
+            record for record in checked_records if self._is_new_query(record, seen_queries)
+        )
+        if near_duplicate_threshold is None:
+            yield from unique_records
+        else:
+            yield from self._remove_near_duplicates(list(unique_records), near_duplicate_threshold)
 
-        Example:
-            If two records both have user messages ["What's the weather?", "In Boston"],
-            only the first one is kept.
+    def _is_new_query(self, record: dict[str, Any], seen_queries: set[str]) -> bool:
+        """Check a record against the queries seen so far, counting and remembering its query."""
+        # The query fingerprint is stored at ingest time, legacy records are hashed here
+        query_key = get_query_hash(record)
 
-        Returns:
-            List of unique records (duplicates removed)
+        if not query_key:
+            # Keep records without identifiable user messages
+            return True
+        if query_key in seen_queries:
+            self.validation_stats["deduplicated_queries"] += 1
+            return False
 
-        Note:
-            - Only looks at user messages (role="user") for deduplication
-            - Records without user messages are always kept
-            - First occurrence of duplicate is kept, later ones are removed
+        seen_queries.add(query_key)
+        return True
+
+    def _remove_near_duplicates(
+        self, records: list[dict[str, Any]], threshold: float
+    ) -> list[dict[str, Any]]:
+        """
+        Remove records whose user queries are near-duplicates of an earlier record's.
+
+        The signatures are computed in vectorised blocks, so this stage collects the
+        exactly deduplicated records before yielding them.
         """
-        seen_queries = set()
-        unique_records = []
-
-        for record in records:
-            try:
-                messages = record.get("request", {}).get("messages", [])
-
-                # Check if messages is actually a list
-                if not isinstance(messages, list):
-                    # Keep records with malformed messages
-                    unique_records.append(record)
-                    continue
-
-                user_messages = [
-                    msg["content"]
-                    for msg in messages
-                    if isinstance(msg, dict) and msg.get("role") == "user" and msg.get("content")
-                ]
-
-                # Convert to tuple for hashability
-                query_key = tuple(user_messages) if user_messages else None
-
-                if query_key and query_key not in seen_queries:
-                    seen_queries.add(query_key)
-                    unique_records.append(record)
-                elif query_key:
-                    self.validation_stats["deduplicated_queries"] += 1
-                else:
-                    # Keep records without identifiable user messages
-                    unique_records.append(record)
-            except (KeyError, TypeError) as e:
-                logger.debug(f"Error in deduplication: {e}")
-                unique_records.append(record)
-
-        return unique_records
+        query_texts = [get_query_text(record) for record in records]
+        with_query = [i for i, text in enumerate(query_texts) if text]
+
+        index = NearDuplicateIndex(threshold)
+        flags = index.find_duplicates([query_texts[i] for i in with_query])
+        near_duplicates = {i for i, flag in zip(with_query, flags, strict=True) if flag}
+
+        self.validation_stats["near_duplicate_queries"] += len(near_duplicates)
+        logger.info(
+            f"Removed {len(near_duplicates)} near-duplicate queries "
+            f"(similarity >= {threshold}) from {len(records)} records"
+        )
+        return [record for i, record in enumerate(records) if i not in near_duplicates]
 
     def _log_validation_stats(self):
         """Log validation statistics."""
@@ -291,6 +335,10 @@ class DataValidator:
         logger.info(f"  Invalid format:             {stats['invalid_format']}")
         logger.info(f"  Removed (quality filters):  {stats['removed_quality_filters']}")
         logger.info(f"  Deduplicated:               {stats['deduplicated_queries']}")
+        logger.info(f"  Near-duplicates removed:    {stats['near_duplicate_queries']}")
+        for key, count in sorted(stats.items()):
+            if key.startswith(FIELD_FAILURE_PREFIX):
+                logger.info(f"    {key.removeprefix(FIELD_FAILURE_PREFIX)}: {count}")
         logger.info(f"  Final selected:             {stats['final_selected']}")
         logger.info("-------------------------------------------------")
 
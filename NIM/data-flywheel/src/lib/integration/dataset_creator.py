@@ -1,25 +1,50 @@
-import json
+import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
 from datetime import datetime
 from typing import Any
 
 from bson import ObjectId
+from pymongo.database import Database
 
 from src.api.db import get_db
 from src.api.models import DatasetType, WorkloadClassification
 from src.config import DataSplitConfig, settings
+from src.lib.flywheel import codec
+from src.lib.flywheel.tokenizer import get_token_counter
 from src.lib.flywheel.util import (
     format_evaluator,
     format_training_data,
-    generate_icl_records,
+    iter_icl_jsonl,
     select_icl_examples,
     split_records,
 )
+from src.lib.integration.chunked_executor import ChunkedExecutor
 from src.lib.integration.data_validator import DataValidator
+from src.lib.integration.jsonl_writer import SpooledJSONLWriter
+from src.lib.integration.record_fingerprint import compute_records_digest
 from src.lib.nemo.data_uploader import DataUploader
 from src.log_utils import setup_logging
 
 logger = setup_logging("data_flywheel.dataset_creator")
 
+# Order of the datasets stored on a flywheel run
+DATASET_TYPES = (DatasetType.BASE, DatasetType.ICL, DatasetType.TRAIN)
+# Part of the dataset content hash, bump it when the formatting of datasets changes
+DATASET_FORMAT_VERSION = 2
+# ICL settings that change the ICL dataset, the others only tune token counting
+ICL_CONTENT_FIELDS = {
+    "max_context_length",
+    "reserved_tokens",
+    "max_examples",
+    "example_selection",
+}
+
+
+def to_jsonl(records: list[dict[str, Any]]) -> bytes:
+    """Serialise records to JSONL bytes, one JSON document per line."""
+    return codec.dumps_jsonl(records)
+
 
 class DatasetCreator:
     records: list[dict[str, Any]]
@@ -45,12 +70,20 @@ class DatasetCreator:
         self.split_config = split_config or settings.data_split_config
 
     def create_datasets(self, workload_type: WorkloadClassification) -> dict[str, str]:
+        # The CPU-bound stages run on worker processes when processing_config.num_workers > 1
+        with ChunkedExecutor(settings.processing_config) as executor:
+            return self._create_datasets(workload_type, executor)
+
+    def _create_datasets(
+        self, workload_type: WorkloadClassification, executor: ChunkedExecutor
+    ) -> dict[str, str]:
         # Validate and clean records
         validator = DataValidator()
         validated_records = validator.validate_records(
             self.records,
             workload_type,
             split_config=self.split_config,
+            executor=executor,
         )
 
         logger.info(
@@ -65,6 +98,21 @@ class DatasetCreator:
             {"_id": ObjectId(self.flywheel_run_id)}, {"$set": {"num_records": len(self.records)}}
         )
 
+        # Reuse the datasets of an earlier run with exactly the same content
+        content_hash = None
+        if settings.processing_config.reuse_datasets:
+            content_hash = self._content_hash(executor, workload_type)
+            datasets = self._reuse_datasets(db, content_hash)
+            if datasets is not None:
+                logger.info(
+                    f"Reusing datasets {[dataset['name'] for dataset in datasets]} "
+                    f"with content hash {content_hash}"
+                )
+                return {
+                    dataset_type: dataset["name"]
+                    for dataset_type, dataset in zip(DATASET_TYPES, datasets, strict=True)
+                }
+
         # split the jsonl data into train and val
         eval_records, train_records, val_records = split_records(self.records, self.split_config)
         logger.info(
@@ -80,36 +128,62 @@ class DatasetCreator:
         logger.info("\n\n")
 
         ## format the training data
-        train_records = format_training_data(train_records, workload_type)
-        val_records = format_training_data(val_records, workload_type)
+        train_records = executor.map_records(format_training_data, train_records, workload_type)
+        val_records = executor.map_records(format_training_data, val_records, workload_type)
 
         # Format evaluation data for OpenAI API compatibility (convert tool call args to strings)
-        eval_records = format_evaluator(eval_records)
-
-        # Convert all record sets to JSONL format
-        eval_jsonl_data, train_jsonl_data, val_jsonl_data = (
-            "\n".join(json.dumps(record) for record in records)
-            for records in [eval_records, train_records, val_records]
-        )
+        eval_records = executor.map_records(format_evaluator, eval_records)
 
+        # Each dataset is serialised into a spooled file and uploaded from there. The
+        # uploads run concurrently on a bounded thread pool while the next dataset is
+        # serialised; the pool is shut down (waiting for the uploads) before the spooled
+        # files are closed
         eval_dataset_name = f"flywheel-eval-{self.output_dataset_prefix + '-' if self.output_dataset_prefix else ''}{self.workload_id}-{self.ts}"
-        eval_uploader = DataUploader(dataset_name=eval_dataset_name)
-        eval_uploader.upload_data(eval_jsonl_data, "eval_data.jsonl")
-
-        icl_records = generate_icl_records(eval_records, selected_examples=icl_examples)
-        # Format ICL records for evaluation as well
-        icl_records = format_evaluator(icl_records)
-        icl_jsonl_data = "\n".join(json.dumps(record) for record in icl_records)
         icl_dataset_name = f"flywheel-icl-{self.output_dataset_prefix + '-' if self.output_dataset_prefix else ''}{self.workload_id}-{self.ts}"
-        icl_uploader = DataUploader(dataset_name=icl_dataset_name)
-        icl_uploader.upload_data(icl_jsonl_data, "eval_data.jsonl")
-
         train_dataset_name = f"flywheel-train-{self.output_dataset_prefix + '-' if self.output_dataset_prefix else ''}{self.workload_id}-{self.ts}"
-        train_uploader = DataUploader(dataset_name=train_dataset_name)
-        train_uploader.upload_data(train_jsonl_data, "training/train_data.jsonl")
-        train_uploader.upload_data(val_jsonl_data, "validation/val_data.jsonl")
+        uploads: dict[str, Future[str]] = {}
+        with (
+            ExitStack() as spooled_files,
+            ThreadPoolExecutor(
+                max_workers=settings.processing_config.upload_concurrency,
+                thread_name_prefix="dataset-upload",
+            ) as upload_pool,
+        ):
+            eval_jsonl_data = spooled_files.enter_context(self._write_jsonl(executor, eval_records))
+            uploads[eval_dataset_name] = upload_pool.submit(
+                self._upload, eval_dataset_name, [(eval_jsonl_data, "eval_data.jsonl")]
+            )
+
+            train_jsonl_data = spooled_files.enter_context(
+                self._write_jsonl(executor, train_records)
+            )
+            val_jsonl_data = spooled_files.enter_context(self._write_jsonl(executor, val_records))
+            uploads[train_dataset_name] = upload_pool.submit(
+                self._upload,
+                train_dataset_name,
+                [
+                    (train_jsonl_data, "training/train_data.jsonl"),
+                    (val_jsonl_data, "validation/val_data.jsonl"),
+                ],
+            )
+
+            # Stream the ICL records straight into the upload buffer while the other
+            # datasets upload. The eval records are already formatted for evaluation
+            # and the injected system message has no tool calls
+            icl_jsonl_data = spooled_files.enter_context(
+                SpooledJSONLWriter(settings.processing_config.spool_max_memory)
+            )
+            num_icl_records = icl_jsonl_data.write_lines(
+                iter_icl_jsonl(eval_records, selected_examples=icl_examples)
+            )
+            uploads[icl_dataset_name] = upload_pool.submit(
+                self._upload, icl_dataset_name, [(icl_jsonl_data, "eval_data.jsonl")]
+            )
+
+            nmp_uris = self._wait_for_uploads(uploads)
 
-        # update the flywheel run with the dataset names
+        # update the flywheel run with the dataset names, and offer them for reuse when
+        # their content hash is known
         db.flywheel_runs.update_one(
             {"_id": ObjectId(self.flywheel_run_id)},
             {
@@ -118,19 +192,20 @@ class DatasetCreator:
                         {
                             "name": eval_dataset_name,
                             "num_records": len(eval_records),
-                            "nmp_uri": eval_uploader.get_file_uri(),
+                            "nmp_uri": nmp_uris[eval_dataset_name],
                         },
                         {
                             "name": icl_dataset_name,
-                            "num_records": len(icl_records),
-                            "nmp_uri": icl_uploader.get_file_uri(),
+                            "num_records": num_icl_records,
+                            "nmp_uri": nmp_uris[icl_dataset_name],
                         },
                         {
                             "name": train_dataset_name,
                             "num_records": len(train_records),
-                            "nmp_uri": train_uploader.get_file_uri(),
+                            "nmp_uri": nmp_uris[train_dataset_name],
                         },
                     ],
+                    **({"dataset_content_hash": content_hash} if content_hash else {}),
                 }
             },
         )
@@ -140,3 +215,141 @@ class DatasetCreator:
             DatasetType.ICL: icl_dataset_name,  # as testing record are converted to icl records and uploaded
             DatasetType.TRAIN: train_dataset_name,
         }
+
+    def _content_hash(
+        self, executor: ChunkedExecutor, workload_type: WorkloadClassification
+    ) -> str:
+        """
+        Hash everything the datasets are made from: the validated records in order, the
+        workload type, the data split configuration, the ICL settings that change which
+        examples are injected, the token counting backend and the format version.
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(
+            codec.canonical_dumpb(
+                {
+                    "format_version": DATASET_FORMAT_VERSION,
+                    "workload_type": workload_type.value,
+                    "split_config": self.split_config.model_dump(),
+                    "icl_config": settings.icl_config.model_dump(include=ICL_CONTENT_FIELDS),
+                    "token_counter": get_token_counter().resolved_backend(),
+                }
+            )
+        )
+        for digests in executor.imap(compute_records_digest, self.records):
+            hasher.update(digests)
+        return hasher.hexdigest()
+
+    def _reuse_datasets(self, db: Database, content_hash: str) -> list[dict[str, Any]] | None:
+        """
+        Store the datasets of the latest other run with the same content hash on this run.
+
+        The datasets are referenced from this run before they are checked, so a deletion
+        of the other run that starts later keeps them (see is_dataset_shared). A deletion
+        that started earlier has withdrawn the other run's content hash, which the check
+        sees, so the reference is dropped again and new datasets are created.
+
+        Returns:
+            The dataset entries stored on this run, None if there is no such run, it is
+            being deleted or any of its datasets no longer exists
+        """
+        run_id = ObjectId(self.flywheel_run_id)
+        previous_run = db.flywheel_runs.find_one(
+            {"dataset_content_hash": content_hash, "_id": {"$ne": run_id}},
+            {"datasets": 1},
+            sort=[("started_at", -1)],
+        )
+        if previous_run is None:
+            return None
+
+        datasets = [
+            {
+                "name": dataset["name"],
+                "num_records": dataset["num_records"],
+                "nmp_uri": dataset["nmp_uri"],
+            }
+            for dataset in previous_run.get("datasets") or []
+        ]
+        if len(datasets) != len(DATASET_TYPES):
+            return None
+
+        db.flywheel_runs.update_one(
+            {"_id": run_id},
+            {"$set": {"datasets": datasets, "dataset_content_hash": content_hash}},
+        )
+        if not db.flywheel_runs.count_documents(
+            {"_id": previous_run["_id"], "dataset_content_hash": content_hash}, limit=1
+        ):
+            logger.info(
+                f"Flywheel run {previous_run['_id']} with content hash {content_hash} is "
+                "being deleted, creating new datasets"
+            )
+        elif missing := [
+            dataset["name"]
+            for dataset in datasets
+            if not DataUploader(dataset_name=dataset["name"]).dataset_exists()
+        ]:
+            logger.info(
+                f"Datasets {missing} with content hash {content_hash} no longer exist, "
+                "creating new datasets"
+            )
+        else:
+            return datasets
+
+        db.flywheel_runs.update_one(
+            {"_id": run_id}, {"$set": {"datasets": []}, "$unset": {"dataset_content_hash": ""}}
+        )
+        return None
+
+    @staticmethod
+    def _upload(dataset_name: str, files: list[tuple[SpooledJSONLWriter, str]]) -> str:
+        """Upload spooled files into one dataset and return its verified file URI."""
+        uploader = DataUploader(dataset_name=dataset_name)
+        for jsonl_data, file_path in files:
+            uploader.upload_data(jsonl_data.fileobj, file_path)
+        return uploader.get_file_uri()
+
+    @staticmethod
+    def _wait_for_uploads(uploads: dict[str, Future[str]]) -> dict[str, str]:
+        """
+        Wait for all dataset uploads to finish.
+
+        Returns:
+            The file URI of each dataset
+
+        Raises:
+            The exception of the first failed upload, after every upload has finished
+            and each failure has been logged
+        """
+        wait(uploads.values())
+        errors = []
+        for dataset_name, upload in uploads.items():
+            error = upload.exception()
+            if error is not None:
+                logger.error(f"Failed to upload dataset {dataset_name}: {error}")
+                errors.append(error)
+        if errors:
+            raise errors[0]
+        return {dataset_name: upload.result() for dataset_name, upload in uploads.items()}
+
+    @staticmethod
+    def _write_jsonl(
+        executor: ChunkedExecutor, records: list[dict[str, Any]]
+    ) -> SpooledJSONLWriter:
+        """
+        Serialise records into a spooled JSONL file, keeping the record order.
+
+        Worker processes serialise whole chunks, which are written as they complete;
+        otherwise records are serialised and written one by one.
+        """
+        writer = SpooledJSONLWriter(settings.processing_config.spool_max_memory)
+        try:
+            if executor.parallel:
+                for chunk in executor.imap(to_jsonl, records):
+                    writer.write_chunk(chunk)
+            else:
+                writer.write_records(records)
+        except BaseException:
+            writer.close()
+            raise
+        return writer
@@ -14,17 +14,42 @@
 # limitations under the License.
 # Initialize Elasticsearch client
 import os
+import threading
 import time
 
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, BadRequestError, Elasticsearch
+from elasticsearch import ConnectionError as ESConnectionError
 
+from src.lib.integration.record_fingerprint import (
+    QUERY_HASH_FIELD,
+    RECORD_HASH_FIELD,
+    TOOL_SIGNATURE_FIELD,
+)
 from src.log_utils import setup_logging
 
 logger = setup_logging("data_flywheel.es_client")
 
 ES_COLLECTION_NAME = os.getenv("ES_COLLECTION_NAME", "flywheel")
 ES_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+# Size of the connection pool kept per Elasticsearch node by the shared client
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "10"))
+# Minimum number of seconds between two liveness pings of the shared client
+ES_LIVENESS_INTERVAL = float(os.getenv("ES_LIVENESS_INTERVAL", "30"))
 
+# Process-wide client, see get_es_client()
+_client: Elasticsearch | None = None
+_client_lock = threading.Lock()
+_last_liveness_check = 0.0
+
+# API-side async client, bound to the FastAPI app lifespan
+_async_client: AsyncElasticsearch | None = None
+
+# Fingerprints computed at ingest time, see record_fingerprint.py
+FINGERPRINT_PROPERTIES = {
+    RECORD_HASH_FIELD: {"type": "keyword"},
+    QUERY_HASH_FIELD: {"type": "keyword"},
+    TOOL_SIGNATURE_FIELD: {"type": "keyword"},
+}
 
 ES_INDEX_SETTINGS = {
     "settings": {
@@ -45,6 +70,7 @@ ES_INDEX_SETTINGS = {
             "workload_id": {"type": "keyword"},
             "client_id": {"type": "keyword"},
             "timestamp": {"type": "date"},
+            **FINGERPRINT_PROPERTIES,
             "request": {
                 "type": "object",
                 "dynamic": False,  # Don't map any fields in request
@@ -60,38 +86,139 @@ ES_INDEX_SETTINGS = {
 }
 
 
-def get_es_client():
-    """Get a working Elasticsearch client, retrying if needed."""
+def _add_fingerprint_mapping(client: Elasticsearch) -> None:
+    """Add the fingerprint fields to an existing index, tolerating conflicting mappings."""
+    try:
+        # Adding fields is non-breaking, so indices created before the fingerprint
+        # fields existed are upgraded in place
+        client.indices.put_mapping(index=ES_COLLECTION_NAME, properties=FINGERPRINT_PROPERTIES)
+    except BadRequestError as err:
+        # A field of the same name with another type cannot be changed in place. The
+        # records are still exported and hashed on the fly where no fingerprint is
+        # stored, and the census reports the fingerprint statistics as unknown
+        logger.error(
+            f"Cannot add the fingerprint fields to index {ES_COLLECTION_NAME}, "
+            f"fingerprints are unavailable: {err!s}"
+        )
+
+
+def _bootstrap_client() -> Elasticsearch:
+    """Create a client and wait for the cluster and the index to be ready, retrying if needed."""
     for attempt in range(30):  # Try for up to 30 seconds
+        client = Elasticsearch(hosts=[ES_URL], connections_per_node=ES_CONNECTIONS_PER_NODE)
         try:
-            client = Elasticsearch(hosts=[ES_URL])
             if client.ping():
                 health = client.cluster.health()
                 if health["status"] in ["yellow", "green"]:
                     logger.info(f"Elasticsearch is ready! Status: {health['status']}")
                     # Create index if it doesn't exist
-
-                    client.indices.refresh()
                     if not client.indices.exists(index=ES_COLLECTION_NAME):
                         logger.info("Creating index...")
                         # Define the index settings with field mappings
                         client.indices.create(index=ES_COLLECTION_NAME, body=ES_INDEX_SETTINGS)
                     else:
                         logger.info("Index already exists")
+                        _add_fingerprint_mapping(client)
 
                     return client
                 else:
                     logger.info(
                         f"Waiting for Elasticsearch to be healthy (status: {health['status']})..."
                     )
+            client.close()
             time.sleep(1)
-        except ConnectionError as err:
+        except (ConnectionError, ESConnectionError) as err:
+            client.close()
             if attempt == 29:
                 msg = "Could not connect to Elasticsearch"
                 logger.error(msg)
                 raise RuntimeError(msg) from err
             time.sleep(1)
+        except Exception:
+            client.close()
+            raise
 
     msg = "Elasticsearch did not become healthy in time"
     logger.error(msg)
     raise RuntimeError(msg)
+
+
+def get_es_client() -> Elasticsearch:
+    """
+    Get the process-wide Elasticsearch client.
+
+    The client and its connection pool are created lazily on first use, and the
+    cluster health and index bootstrap only run then. Later calls return the shared
+    client and re-check it with a ping at most every ES_LIVENESS_INTERVAL seconds,
+    rebuilding it if the cluster stopped answering.
+    """
+    global _client, _last_liveness_check
+
+    with _client_lock:
+        now = time.monotonic()
+        if _client is not None and now - _last_liveness_check > ES_LIVENESS_INTERVAL:
+            if _client.ping():
+                _last_liveness_check = now
+            else:
+                logger.warning("Elasticsearch client failed its liveness check, reconnecting")
+                _client.close()
+                _client = None
+
+        if _client is None:
+            _client = _bootstrap_client()
+            _last_liveness_check = time.monotonic()
+
+        return _client
+
+
+def close_es_client():
+    """Close the process-wide Elasticsearch client."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_async_es_client() -> AsyncElasticsearch:
+    """Get the async Elasticsearch client of the API process."""
+    if _async_client is None:
+        raise RuntimeError(
+            "Async Elasticsearch client not initialized. Call init_async_es_client() first."
+        )
+    return _async_client
+
+
+async def init_async_es_client() -> AsyncElasticsearch:
+    """
+    Initialize the async Elasticsearch client of the API process.
+
+    The client shares one connection pool across all requests handled by the event
+    loop. Index bootstrap is left to the workers, the API only reads.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncElasticsearch(
+            hosts=[ES_URL], connections_per_node=ES_CONNECTIONS_PER_NODE
+        )
+        if not await _async_client.ping():
+            logger.warning("Elasticsearch is not reachable yet, API record queries may fail")
+    return _async_client
+
+
+async def close_async_es_client():
+    """Close the async Elasticsearch client of the API process."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def _reset_after_fork():
+    """Drop the parent's client in a forked child, its sockets cannot be shared."""
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
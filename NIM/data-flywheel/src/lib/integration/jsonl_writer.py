@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import io
+import tempfile
+from collections.abc import Iterable
+from typing import Any
+
+from src.lib.flywheel import codec
+from src.log_utils import setup_logging
+
+logger = setup_logging("data_flywheel.jsonl_writer")
+
+
+class SpooledJSONLWriter:
+    """
+    Serialises records one by one into a JSONL dataset file.
+
+    The lines are written to an in-memory buffer until it holds more than `max_memory`
+    bytes, after which the buffer is moved to an anonymous temporary file on disk and
+    writing continues there, so dataset size is bounded by disk rather than memory.
+    Lines are separated by newlines, without a trailing newline.
+
+    `fileobj` is the underlying binary file object, which can be handed directly to
+    `DataUploader.upload_data`. Both backings are `io.BufferedIOBase` instances, as
+    required by the Hugging Face upload API. The temporary file is removed by `close()`
+    or when the writer is used as a context manager.
+    """
+
+    def __init__(self, max_memory: int):
+        self.max_memory = max_memory
+        self.num_records = 0
+        self._file: io.BufferedIOBase = io.BytesIO()
+        self._spilled = False
+
+    @property
+    def fileobj(self) -> io.BufferedIOBase:
+        """The file object holding the lines written so far."""
+        return self._file
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the lines were moved to a temporary file on disk."""
+        return self._spilled
+
+    def __enter__(self) -> "SpooledJSONLWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the buffer, deleting the temporary file if there is one."""
+        self._file.close()
+
+    def write_line(self, line: bytes) -> None:
+        """Append a serialised record without its line terminator."""
+        self._write(line, 1)
+
+    def write_chunk(self, lines: bytes) -> None:
+        """
+        Append a block of newline-separated serialised records, e.g. from `to_jsonl`.
+
+        Compact JSON never contains a raw newline, so the records are counted by their
+        separators.
+        """
+        if lines:
+            self._write(lines, lines.count(b"\n") + 1)
+
+    def _write(self, lines: bytes, num_records: int) -> None:
+        if self.num_records:
+            self._file.write(b"\n")
+        self._file.write(lines)
+        self.num_records += num_records
+
+        if not self._spilled and self._file.tell() > self.max_memory:
+            self._spill()
+
+    def write_lines(self, lines: Iterable[bytes]) -> int:
+        """Append serialised lines as they are produced, returns the number of lines."""
+        num_records = self.num_records
+        for line in lines:
+            self.write_line(line)
+        return self.num_records - num_records
+
+    def write_records(self, records: Iterable[Any]) -> int:
+        """Serialise and append records one by one, returns the number of records."""
+        return self.write_lines(codec.dumpb(record) for record in records)
+
+    def _spill(self) -> None:
+        spooled = tempfile.TemporaryFile()
+        with self._file.getbuffer() as buffer:
+            spooled.write(buffer)
+        self._file.close()
+        self._file = spooled
+        self._spilled = True
+        logger.info(
+            f"JSONL dataset exceeded {self.max_memory} bytes in memory, "
+            "continuing in a temporary file"
+        )
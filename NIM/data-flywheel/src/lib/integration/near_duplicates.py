@@ -0,0 +1,198 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Near-duplicate detection of user queries with MinHash and locality sensitive hashing.
+
+Each query is normalised and cut into overlapping byte shingles. A MinHash signature
+of `num_perm` values estimates the Jaccard similarity between the shingle sets of two
+queries, and the signatures are split into bands that are hashed into buckets, so only
+queries sharing at least one band bucket are ever compared. Signatures are computed
+with vectorised NumPy operations over blocks of queries, and adding a query to the
+index does not depend on the number of queries already in it, so deduplicating n
+records takes roughly linear time.
+"""
+
+import re
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+# Multiplier of the multiplicative hash folding a shingle into 32 bits
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_SHIFT = np.uint64(32)
+# Upper bound of shingles hashed at once, keeps a block at about num_perm * 12 * 64k bytes
+_BLOCK_SHINGLES = 65536
+_WHITESPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+
+
+def get_query_text(record: dict[str, Any]) -> str | None:
+    """
+    Get the normalised user query text of a record, None if it has no user messages.
+
+    The user messages are joined, lowercased, whitespace is collapsed and every run of
+    digits is replaced with a single 0, so queries rendered from one template with
+    different ids, amounts or timestamps normalise to (nearly) the same text.
+    """
+    try:
+        contents = [
+            str(msg["content"])
+            for msg in record["request"]["messages"]
+            if isinstance(msg, dict) and msg.get("role") == "user" and msg.get("content")
+        ]
+    except (KeyError, TypeError):
+        return None
+
+    if not contents:
+        return None
+    text = _WHITESPACE.sub(" ", "\n".join(contents)).strip().lower()
+    return _DIGITS.sub("0", text)
+
+
+def _lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """
+    Choose the number of bands and rows per band for a similarity threshold.
+
+    Two signatures become candidates with probability 1 - (1 - s**rows)**bands, an
+    S-curve in the similarity s whose steepest point is about (1 / bands)**(1 / rows);
+    the split putting that point closest to the threshold is used.
+    """
+    splits = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(splits, key=lambda split: abs((1 / split[0]) ** (1 / split[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of user queries.
+
+    `find_duplicates` walks the queries in order and flags each query that is
+    near-identical (estimated Jaccard similarity of its shingles at or above the
+    threshold) to an earlier, unflagged query; unflagged queries are added to the
+    index. Only the first occurrence of a group of near-duplicates is therefore kept,
+    also across successive calls.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        num_perm: int = 64,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.num_bands, self.rows_per_band = _lsh_bands(num_perm, threshold)
+        self._min_matches = int(np.ceil(threshold * num_perm))
+
+        # Multiply-add-shift hash functions (a * x + b) >> 32 with odd 64-bit a stand in
+        # for the permutations; they are fixed by the seed so results do not vary
+        rng = np.random.default_rng(seed)
+        max_uint64 = np.iinfo(np.uint64).max
+        self._a = rng.integers(0, max_uint64, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+        self._a |= np.uint64(1)
+        self._b = rng.integers(0, max_uint64, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+        # Random odd weights combining the rows of a band into a single 64-bit bucket key
+        self._band_weights = rng.integers(
+            0, max_uint64, size=self.rows_per_band, dtype=np.uint64, endpoint=True
+        ) | np.uint64(1)
+
+        self._buckets: list[dict[int, list[int]]] = [{} for _ in range(self.num_bands)]
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """Compute the MinHash signatures of query texts, one row per text."""
+        size = self.shingle_size
+        # Texts shorter than a shingle are padded to form a single shingle
+        encoded = [text.encode("utf-8").ljust(size, b"\0") for text in texts]
+        num_shingles = np.array([len(data) - size + 1 for data in encoded], dtype=np.int64)
+
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(texts):
+            # Grow the block until it holds _BLOCK_SHINGLES shingles, at least one text
+            counts = np.cumsum(num_shingles[start:])
+            end = start + max(1, int(np.searchsorted(counts, _BLOCK_SHINGLES, side="right")))
+            result[start:end] = self._block_signatures(encoded[start:end], num_shingles[start:end])
+            start = end
+        return result
+
+    def _block_signatures(self, encoded: list[bytes], num_shingles: np.ndarray) -> np.ndarray:
+        size = self.shingle_size
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        num_windows = len(data) - size + 1
+
+        # Polynomial hash of every window of the concatenated texts, folded to 32 bits
+        hashes = np.zeros(num_windows, dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * np.uint64(257) + data[offset : offset + num_windows]
+        hashes = (hashes * _GOLDEN) >> _SHIFT
+
+        # Keep only the windows lying within a single text
+        lengths = num_shingles + size - 1
+        text_starts = np.cumsum(lengths) - lengths
+        text_ids = np.repeat(np.arange(len(encoded)), lengths)[:num_windows]
+        within_text = np.arange(num_windows) - text_starts[text_ids] < num_shingles[text_ids]
+        hashes = hashes[within_text]
+
+        permuted = ((self._a * hashes + self._b) >> _SHIFT).astype(np.uint32)
+        segments = np.cumsum(num_shingles) - num_shingles
+        return np.minimum.reduceat(permuted, segments, axis=1).T
+
+    def find_duplicates(self, texts: Sequence[str]) -> list[bool]:
+        """
+        Flag the texts that are near-duplicates of an earlier text, indexing the others.
+
+        Returns:
+            One flag per text, True for near-duplicates
+        """
+        if not texts:
+            return []
+
+        signatures = self.signatures(texts)
+        bands = signatures.reshape(len(texts), self.num_bands, self.rows_per_band)
+        all_band_keys = (bands.astype(np.uint64) * self._band_weights).sum(axis=2).tolist()
+
+        flags = []
+        for signature, band_keys in zip(signatures, all_band_keys, strict=True):
+            candidates: set[int] = set()
+            for buckets, key in zip(self._buckets, band_keys, strict=True):
+                candidates.update(buckets.get(key, ()))
+
+            if candidates:
+                matches = self._signatures[list(candidates)] == signature
+                if np.count_nonzero(matches, axis=1).max() >= self._min_matches:
+                    flags.append(True)
+                    continue
+
+            position = self._append(signature)
+            for buckets, key in zip(self._buckets, band_keys, strict=True):
+                buckets.setdefault(key, []).append(position)
+            flags.append(False)
+
+        return flags
+
+    def _append(self, signature: np.ndarray) -> int:
+        if self._size == len(self._signatures):
+            grown = np.empty((2 * len(self._signatures), self.num_perm), dtype=np.uint32)
+            grown[: self._size] = self._signatures
+            self._signatures = grown
+        self._signatures[self._size] = signature
+        self._size += 1
+        return self._size - 1
@@ -12,20 +12,144 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import json
-from typing import Any
+from collections.abc import Callable
+from typing import Any, NamedTuple
 
+from src.lib.flywheel import codec
 from src.log_utils import setup_logging
 
 logger = setup_logging("data_flywheel.openai_format_validator")
 
+# A compiled check returns the path of the first field failing validation, None if valid
+Check = Callable[[Any], str | None]
+# A schema node compiles into a check for the field at the given path
+SchemaNode = Callable[[str], Check]
+
+INVALID_FORMAT = "invalid_format"
+REMOVED_QUALITY_FILTERS = "removed_quality_filters"
+
+TOOL_CALLS_FIELD = "response.choices[].message.tool_calls"
+ARGUMENTS_FIELD = "response.choices[].message.tool_calls[].function.arguments"
+
+
+class ValidationFailure(NamedTuple):
+    """Why a record was rejected: the validation_stats counter and the failing field."""
+
+    kind: str
+    field: str
+
+
+def _present() -> SchemaNode:
+    """Schema node accepting any value."""
+
+    def compile_node(path: str) -> Check:
+        return lambda value: None
+
+    return compile_node
+
+
+def _object(**fields: SchemaNode) -> SchemaNode:
+    """Schema node for a dict with the given required fields."""
+
+    def compile_node(path: str) -> Check:
+        compiled = tuple(
+            (name, field_path, node(field_path))
+            for name, node in fields.items()
+            for field_path in [f"{path}.{name}" if path else name]
+        )
+
+        def check(value: Any) -> str | None:
+            if not isinstance(value, dict):
+                return path or "record"
+            for name, field_path, field_check in compiled:
+                if name not in value:
+                    return field_path
+                failed = field_check(value[name])
+                if failed is not None:
+                    return failed
+            return None
+
+        return check
+
+    return compile_node
+
+
+def _non_empty_list(items: SchemaNode | None = None) -> SchemaNode:
+    """Schema node for a non-empty list, optionally checking each item."""
+
+    def compile_node(path: str) -> Check:
+        item_check = items(f"{path}[]") if items is not None else None
+
+        def check(value: Any) -> str | None:
+            if not isinstance(value, list) or not value:
+                return path
+            if item_check is not None:
+                for item in value:
+                    failed = item_check(item)
+                    if failed is not None:
+                        return failed
+            return None
+
+        return check
+
+    return compile_node
+
+
+# Minimal OpenAI Chat Completion record: the request has a non-empty messages list,
+# the response a non-empty choices list and each choice a message
+CHAT_COMPLETION_SCHEMA = _object(
+    request=_object(messages=_non_empty_list()),
+    response=_object(choices=_non_empty_list(_object(message=_present()))),
+)
+
 
 class OpenAIFormatValidator:
     """
     Minimal validator for OpenAI Dataset format.
     Currently supports Chat Completion format validation.
+
+    The record schema is compiled once into nested checks that report the first
+    failing field, and `validate_record` runs the format check, the tool calling
+    quality check and function argument parsing in a single traversal. Failures are
+    counted per field by the caller, see `DataValidator.validation_stats`.
     """
 
+    _check_format: Check = staticmethod(CHAT_COMPLETION_SCHEMA(""))
+
+    def validate_record(
+        self,
+        record: dict[str, Any],
+        tool_calling: bool = False,
+        parse_arguments: bool = False,
+    ) -> ValidationFailure | None:
+        """
+        Validate a record and, for tool calling records, its tool calls.
+
+        Args:
+            record: The record to validate
+            tool_calling: Require tool calls in the response
+            parse_arguments: Parse tool call function arguments from JSON strings
+                to objects in-place (only with tool_calling)
+
+        Returns:
+            None if the record is valid, otherwise the reason it was rejected
+        """
+        failed_field = self._check_format(record)
+        if failed_field is not None:
+            return ValidationFailure(INVALID_FORMAT, failed_field)
+
+        if not tool_calling:
+            return None
+
+        choices = record["response"]["choices"]
+        if not self._choices_have_tool_calls(choices):
+            return ValidationFailure(REMOVED_QUALITY_FILTERS, TOOL_CALLS_FIELD)
+
+        if parse_arguments and not self._parse_choice_arguments(choices):
+            return ValidationFailure(REMOVED_QUALITY_FILTERS, ARGUMENTS_FIELD)
+
+        return None
+
     def validate_chat_completion_format(self, record: dict[str, Any]) -> bool:
         """
         Minimal validation for OpenAI Chat Completion format.
@@ -42,40 +166,7 @@ class OpenAIFormatValidator:
         Returns:
             bool: True if valid format, False otherwise
         """
-        try:
-            # Check basic structure exists
-            if "request" not in record or "response" not in record:
-                return False
-
-            # Check request has messages
-            request = record["request"]
-            if not isinstance(request, dict) or "messages" not in request:
-                return False
-            if not isinstance(request["messages"], list):
-                return False
-            # Check messages list is not empty
-            if len(request["messages"]) == 0:
-                return False
-
-            # Check response has choices
-            response = record["response"]
-            if not isinstance(response, dict) or "choices" not in response:
-                return False
-            if not isinstance(response["choices"], list):
-                return False
-            # Check choices list is not empty
-            if len(response["choices"]) == 0:
-                return False
-
-            # Check each choice has a message field
-            for choice in response["choices"]:
-                if not isinstance(choice, dict) or "message" not in choice:
-                    return False
-
-            return True
-
-        except Exception:
-            return False
+        return self._check_format(record) is None
 
     def validate_tool_calling_quality(self, record: dict[str, Any]) -> bool:
         """Quality check for tool calling workloads."""
@@ -84,16 +175,20 @@ class OpenAIFormatValidator:
     def _has_tool_calls(self, record: dict[str, Any]) -> bool:
         """Check if record has tool calls in response."""
         try:
-            choices = record.get("response", {}).get("choices", [])
-            for choice in choices:
-                message = choice.get("message", {})
-                # Check for tool_calls or finish_reason indicating tool calls
-                if message.get("tool_calls") or choice.get("finish_reason") == "tool_calls":
-                    return True
-            return False
+            return self._choices_have_tool_calls(record.get("response", {}).get("choices", []))
         except Exception:
             return False
 
+    @staticmethod
+    def _choices_have_tool_calls(choices: list[Any]) -> bool:
+        for choice in choices:
+            message = choice.get("message")
+            has_tool_calls = isinstance(message, dict) and message.get("tool_calls")
+            # Check for tool_calls or finish_reason indicating tool calls
+            if has_tool_calls or choice.get("finish_reason") == "tool_calls":
+                return True
+        return False
+
     def _parse_function_arguments_to_json(self, record: dict[str, Any]) -> bool:
         """Parse function arguments from strings to JSON objects in-place.
 
@@ -102,6 +197,14 @@ class OpenAIFormatValidator:
         """
         try:
             choices = record.get("response", {}).get("choices", [])
+        except AttributeError as e:
+            logger.warning(f"Error parsing function arguments: {e}")
+            return False
+        return self._parse_choice_arguments(choices)
+
+    @staticmethod
+    def _parse_choice_arguments(choices: list[Any]) -> bool:
+        try:
             for choice in choices:
                 tool_calls = choice.get("message", {}).get("tool_calls", [])
                 if tool_calls:
@@ -111,8 +214,8 @@ class OpenAIFormatValidator:
                         if isinstance(arguments, str):
                             try:
                                 # Parse JSON string to object
-                                function["arguments"] = json.loads(arguments)
-                            except json.JSONDecodeError:
+                                function["arguments"] = codec.loads(arguments)
+                            except codec.JSONDecodeError:
                                 logger.warning(f"Failed to parse function arguments: {arguments}")
                                 return False  # Indicate parsing failure
             return True  # Parsing succeeded or no parsing needed
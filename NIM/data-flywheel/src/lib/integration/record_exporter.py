@@ -1,66 +1,640 @@
-import json
+import heapq
+import math
+import queue
+import secrets
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain, islice
+from typing import Any
 
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 
-from src.config import DataSplitConfig
-from src.lib.integration.es_client import ES_COLLECTION_NAME, get_es_client
+from src.config import DataSplitConfig, ExportConfig, settings
+from src.lib.integration.es_client import (
+    ES_COLLECTION_NAME,
+    get_async_es_client,
+    get_es_client,
+)
+from src.lib.integration.record_fingerprint import (
+    QUERY_HASH_FIELD,
+    RECORD_HASH_FIELD,
+    TOOL_SIGNATURE_FIELD,
+    get_record_hash,
+)
+from src.lib.integration.record_snapshot import RecordSnapshot
 from src.log_utils import setup_logging
 
 logger = setup_logging("data_flywheel.record_exporter")
 
+# _shard_doc is the cheapest unique tiebreaker within a point in time
+NEWEST_FIRST = [{"timestamp": {"order": "desc"}}, {"_shard_doc": "desc"}]
+RANDOM_ORDER = [{"_score": {"order": "desc"}}, {"_shard_doc": "desc"}]
+
+# Fields of a logged record read by the rest of the flywheel: the validator, the
+# training/evaluation formatters and ICL generation. Anything else clients log
+# (usage blocks, response ids, sampling parameters) is never used.
+PIPELINE_SOURCE_FIELDS = [
+    "timestamp",
+    "request.messages",
+    "request.tools",
+    "response.choices",
+    RECORD_HASH_FIELD,
+    QUERY_HASH_FIELD,
+]
+
+# Number of most frequent tool signatures listed in a workload census
+CENSUS_TOP_TOOL_SIGNATURES = 20
+
+# Marks the end of a slice in the sliced export queue
+_SLICE_DONE = object()
+
+
+def workload_query(
+    client_id: str, workload_id: str, timestamp_range: dict[str, int] | None = None
+) -> dict[str, Any]:
+    """Query matching the records of a workload, optionally within an epoch millis range."""
+    query: dict[str, Any] = {
+        "bool": {
+            "must": [
+                {"match": {"client_id": client_id}},
+                {"match": {"workload_id": workload_id}},
+            ]
+        }
+    }
+    if timestamp_range:
+        query["bool"]["filter"] = [
+            {"range": {"timestamp": {**timestamp_range, "format": "epoch_millis"}}}
+        ]
+    return query
+
+
+def source_filter(export_config: ExportConfig) -> dict[str, list[str]]:
+    """_source projection of the exported records."""
+    includes = export_config.source_includes
+    return {
+        "includes": PIPELINE_SOURCE_FIELDS if includes is None else includes,
+        "excludes": export_config.source_excludes,
+    }
+
+
+def census_search_kwargs(client_id: str, workload_id: str) -> dict[str, Any]:
+    """
+    Search request describing a workload with aggregations only.
+
+    No documents are returned: the record count comes from the exact hit total and
+    everything else from aggregations over the timestamp and the ingest-time
+    fingerprint fields. Distinct counts use `cardinality` and are approximate.
+    Records logged without the fingerprints are counted by `fingerprinted`, see
+    parse_census_response.
+    """
+    return {
+        "index": ES_COLLECTION_NAME,
+        "query": workload_query(client_id, workload_id),
+        "size": 0,
+        "track_total_hits": True,
+        "aggs": {
+            "first_record": {"min": {"field": "timestamp"}},
+            "last_record": {"max": {"field": "timestamp"}},
+            "fingerprinted": {"filter": {"exists": {"field": RECORD_HASH_FIELD}}},
+            "distinct_queries": {"cardinality": {"field": QUERY_HASH_FIELD}},
+            "tool_calling": {"filter": {"exists": {"field": TOOL_SIGNATURE_FIELD}}},
+            "distinct_tool_signatures": {"cardinality": {"field": TOOL_SIGNATURE_FIELD}},
+            "tool_signatures": {
+                "terms": {"field": TOOL_SIGNATURE_FIELD, "size": CENSUS_TOP_TOOL_SIGNATURES}
+            },
+            "records_per_day": {
+                "date_histogram": {
+                    "field": "timestamp",
+                    "calendar_interval": "day",
+                    "min_doc_count": 1,
+                }
+            },
+        },
+    }
+
+
+def parse_census_response(
+    client_id: str, workload_id: str, response: Mapping[str, Any]
+) -> dict[str, Any]:
+    """
+    Turn the response of a census search into a workload census.
+
+    The query and tool statistics come from the fingerprint fields, which are only
+    stored by writers using add_fingerprints. Unless every record carries them, those
+    statistics are unknown and reported as None rather than as undercounts.
+    """
+    aggs = response["aggregations"]
+    num_records = response["hits"]["total"]["value"]
+    num_fingerprinted = aggs["fingerprinted"]["doc_count"]
+    census = {
+        "client_id": client_id,
+        "workload_id": workload_id,
+        "num_records": num_records,
+        "num_fingerprinted_records": num_fingerprinted,
+        "num_distinct_queries": None,
+        "first_record_at": aggs["first_record"].get("value_as_string"),
+        "last_record_at": aggs["last_record"].get("value_as_string"),
+        "num_tool_calling_records": None,
+        "tool_calling_share": None,
+        "num_tool_signatures": None,
+        "tool_signatures": None,
+        "records_per_day": [
+            {"date": bucket["key_as_string"], "num_records": bucket["doc_count"]}
+            for bucket in aggs["records_per_day"]["buckets"]
+        ],
+    }
+    if num_fingerprinted < num_records:
+        return census
+
+    num_tool_calling = aggs["tool_calling"]["doc_count"]
+    census.update(
+        num_distinct_queries=aggs["distinct_queries"]["value"],
+        num_tool_calling_records=num_tool_calling,
+        tool_calling_share=num_tool_calling / num_records if num_records else 0.0,
+        num_tool_signatures=aggs["distinct_tool_signatures"]["value"],
+        tool_signatures=[
+            {"signature": bucket["key"], "num_records": bucket["doc_count"]}
+            for bucket in aggs["tool_signatures"]["buckets"]
+        ],
+    )
+    return census
+
 
 class RecordExporter:
     es_client: Elasticsearch
+    export_config: ExportConfig
 
-    def __init__(self):
+    def __init__(self, export_config: ExportConfig | None = None):
         self.es_client = get_es_client()
+        self.export_config = export_config or settings.export_config
+
+    def iter_record_pages(
+        self, client_id: str, workload_id: str, max_records: int | None = None
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Stream the records of a workload, newest first, in fixed-size pages.
+
+        The pages are read from a point-in-time snapshot with `search_after` on
+        `timestamp`, so memory stays bounded by the page size and the walk is not
+        capped by the index `max_result_window`.
+
+        Args:
+            client_id: ID of the client that logged the records
+            workload_id: ID of the workload to export
+            max_records: Stop after this many records (None exports everything)
+
+        Yields:
+            Lists of record `_source` documents, at most `page_size` long
+        """
+        query = workload_query(client_id, workload_id)
+        for hits in self._iter_hit_pages(query, NEWEST_FIRST, max_records, ordered=True):
+            yield [hit["_source"] for hit in hits]
+
+    def _iter_hit_pages(
+        self,
+        query: dict[str, Any],
+        sort: list[dict[str, Any]],
+        max_records: int | None = None,
+        sliced: bool = True,
+        ordered: bool = False,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Yield pages of raw search hits from a point-in-time walk, see iter_record_pages.
+
+        With `num_slices` > 1 (and `sliced`) the point in time is split into slices that
+        are walked concurrently. Pages are then yielded in arrival order rather than
+        globally sorted, and each slice contributes at most its share of `max_records`,
+        unless `ordered` is set: the slices are then merged back into `sort` order, so
+        the hits are the first `max_records` of the whole walk.
+        """
+        keep_alive = self.export_config.pit_keep_alive
+        num_slices = self.export_config.num_slices if sliced else 1
+
+        pit = self.es_client.open_point_in_time(index=ES_COLLECTION_NAME, keep_alive=keep_alive)
+        # Shared holder, the PIT id may change between requests
+        pit_ref = {"id": pit["id"]}
+        try:
+            if num_slices > 1 and ordered:
+                yield from self._iter_ordered_slice_hit_pages(
+                    pit_ref, query, sort, max_records, num_slices
+                )
+            elif num_slices > 1:
+                yield from self._iter_sliced_hit_pages(
+                    pit_ref, query, sort, max_records, num_slices
+                )
+            else:
+                yield from self._walk_pit(pit_ref, query, sort, max_records)
+        finally:
+            self.es_client.close_point_in_time(id=pit_ref["id"])
+
+    def _walk_pit(
+        self,
+        pit_ref: dict[str, str],
+        query: dict[str, Any],
+        sort: list[dict[str, Any]],
+        max_records: int | None = None,
+        slice_spec: dict[str, int] | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Page through an open point in time (or one slice of it) with search_after."""
+        page_size = self.export_config.page_size
+        keep_alive = self.export_config.pit_keep_alive
+
+        fetched = 0
+        search_after = None
+        while max_records is None or fetched < max_records:
+            size = page_size if max_records is None else min(page_size, max_records - fetched)
+            search_kwargs: dict[str, Any] = {
+                "pit": {"id": pit_ref["id"], "keep_alive": keep_alive},
+                "query": query,
+                "sort": sort,
+                "size": size,
+                "source": source_filter(self.export_config),
+                "track_total_hits": False,
+            }
+            if slice_spec is not None:
+                search_kwargs["slice"] = slice_spec
+            if search_after is not None:
+                search_kwargs["search_after"] = search_after
+
+            response = self.es_client.search(**search_kwargs)
+            # The PIT id may change between requests, always page with the latest one
+            pit_ref["id"] = response.get("pit_id", pit_ref["id"])
+
+            hits = response["hits"]["hits"]
+            if not hits:
+                break
+
+            fetched += len(hits)
+            search_after = hits[-1]["sort"]
+            yield hits
+
+            if len(hits) < size:
+                break
+
+    def _iter_sliced_hit_pages(
+        self,
+        pit_ref: dict[str, str],
+        query: dict[str, Any],
+        sort: list[dict[str, Any]],
+        max_records: int | None,
+        num_slices: int,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Walk the slices of a point in time on a thread pool and merge their pages."""
+        per_slice = None if max_records is None else math.ceil(max_records / num_slices)
+        # Bounded so slow consumers apply back pressure instead of buffering everything
+        pages: queue.Queue = queue.Queue(maxsize=num_slices * 2)
+        stop = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=num_slices, thread_name_prefix="es-slice") as executor:
+            run_slice = partial(self._run_slice, pit_ref, query, sort, per_slice, pages, stop)
+            for slice_id in range(num_slices):
+                executor.submit(run_slice, {"id": slice_id, "max": num_slices})
+
+            try:
+                done = 0
+                fetched = 0
+                while done < num_slices:
+                    item = pages.get()
+                    if item is _SLICE_DONE:
+                        done += 1
+                        continue
+                    if isinstance(item, Exception):
+                        raise item
+
+                    if max_records is not None:
+                        item = item[: max_records - fetched]
+                    fetched += len(item)
+                    yield item
+
+                    if max_records is not None and fetched >= max_records:
+                        break
+            finally:
+                # Unblock the slices still running so the pool can shut down
+                stop.set()
+
+    def _iter_ordered_slice_hit_pages(
+        self,
+        pit_ref: dict[str, str],
+        query: dict[str, Any],
+        sort: list[dict[str, Any]],
+        max_records: int | None,
+        num_slices: int,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Walk the slices of a point in time on a thread pool and merge their hits by `sort`.
+
+        The sort must be descending, like NEWEST_FIRST. Any slice may hold all of the
+        first `max_records` hits, so each slice may contribute up to `max_records`; the
+        slices are read lazily, so only a couple of pages per slice are fetched ahead
+        of the merge.
+        """
+        page_size = self.export_config.page_size
+        slice_pages: list[queue.Queue] = [queue.Queue(maxsize=2) for _ in range(num_slices)]
+        stop = threading.Event()
+
+        def iter_slice_hits(pages: queue.Queue) -> Iterator[dict[str, Any]]:
+            while (item := pages.get()) is not _SLICE_DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield from item
+
+        with ThreadPoolExecutor(max_workers=num_slices, thread_name_prefix="es-slice") as executor:
+            run_slice = partial(self._run_slice, pit_ref, query, sort, max_records)
+            for slice_id, pages in enumerate(slice_pages):
+                executor.submit(run_slice, pages, stop, {"id": slice_id, "max": num_slices})
+
+            try:
+                merged = heapq.merge(
+                    *(iter_slice_hits(pages) for pages in slice_pages),
+                    key=lambda hit: hit["sort"],
+                    reverse=True,
+                )
+                merged = islice(merged, max_records)
+                while page := list(islice(merged, page_size)):
+                    yield page
+            finally:
+                # Unblock the slices still running so the pool can shut down
+                stop.set()
+
+    def _run_slice(
+        self,
+        pit_ref: dict[str, str],
+        query: dict[str, Any],
+        sort: list[dict[str, Any]],
+        max_records: int | None,
+        pages: queue.Queue,
+        stop: threading.Event,
+        slice_spec: dict[str, int],
+    ) -> None:
+        """Walk one slice into a page queue, ending with _SLICE_DONE, until stopped."""
+
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        start = time.perf_counter()
+        count = 0
+        try:
+            for hits in self._walk_pit(pit_ref, query, sort, max_records, slice_spec):
+                count += len(hits)
+                if not put(hits):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            logger.info(
+                f"Slice {slice_spec['id'] + 1}/{slice_spec['max']} exported {count} records "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+            put(_SLICE_DONE)
+
+    def iter_sampled_pages(
+        self,
+        client_id: str,
+        workload_id: str,
+        num_records: int,
+        seed: int | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Stream a uniform random sample of the records of a workload.
+
+        Records are ranked by a `random_score` so Elasticsearch picks the sample and only
+        `num_records` documents are transferred. With `sample_time_buckets` set, the
+        workload time range is cut into equal-width buckets and each bucket contributes
+        in proportion to its record count, so no period is over- or under-represented.
+
+        Args:
+            client_id: ID of the client that logged the records
+            workload_id: ID of the workload to sample
+            num_records: Number of records to sample
+            seed: Seed of the random score, the same seed on unchanged data returns the same
+                sample. None draws a seed for this export only
+
+        Yields:
+            Lists of record `_source` documents, at most `page_size` long
+        """
+        if seed is None:
+            # An unseeded random_score is reseeded by Elasticsearch on every request, so
+            # each search_after page would be cut from a different random ordering.
+            # One seed per export keeps the order, and so the paging, stable
+            seed = secrets.randbits(31)
+
+        num_buckets = self.export_config.sample_time_buckets
+        if num_buckets and num_buckets > 1:
+            strata = self._time_strata(client_id, workload_id, num_buckets)
+        else:
+            strata = [(None, None)]
+
+        allocations = _allocate(num_records, [count for _, count in strata])
+        for (timestamp_range, _), allocation in zip(strata, allocations, strict=True):
+            if allocation <= 0:
+                continue
+            query = self._random_query(
+                workload_query(client_id, workload_id, timestamp_range), seed
+            )
+            for hits in self._iter_hit_pages(query, RANDOM_ORDER, allocation):
+                yield [hit["_source"] for hit in hits]
+
+    def _random_query(self, query: dict[str, Any], seed: int) -> dict[str, Any]:
+        # A seeded random_score needs a per-document field, _seq_no is always available
+        return {
+            "function_score": {
+                "query": query,
+                "random_score": {"seed": seed, "field": "_seq_no"},
+                "boost_mode": "replace",
+            }
+        }
+
+    def _time_strata(
+        self, client_id: str, workload_id: str, num_buckets: int
+    ) -> list[tuple[dict[str, int] | None, int | None]]:
+        """Split the workload time range into equal-width buckets with their record counts."""
+        query = workload_query(client_id, workload_id)
+        response = self.es_client.search(
+            index=ES_COLLECTION_NAME,
+            query=query,
+            size=0,
+            aggs={
+                "oldest": {"min": {"field": "timestamp"}},
+                "newest": {"max": {"field": "timestamp"}},
+            },
+        )
+        oldest = response["aggregations"]["oldest"]["value"]
+        newest = response["aggregations"]["newest"]["value"]
+        if oldest is None or newest is None or newest <= oldest:
+            return [(None, None)]
+
+        width = (newest - oldest) / num_buckets
+        bounds = [int(oldest + i * width) for i in range(num_buckets)]
+        ranges: list[dict[str, int]] = []
+        agg_ranges: list[dict[str, int]] = []
+        for i, lower in enumerate(bounds):
+            # The first and last buckets are open-ended so no record falls outside
+            bucket: dict[str, int] = {}
+            agg_range: dict[str, int] = {}
+            if i > 0:
+                bucket["gte"] = agg_range["from"] = lower
+            if i < num_buckets - 1:
+                bucket["lt"] = agg_range["to"] = bounds[i + 1]
+            ranges.append(bucket)
+            agg_ranges.append(agg_range)
+
+        response = self.es_client.search(
+            index=ES_COLLECTION_NAME,
+            query=query,
+            size=0,
+            aggs={"buckets": {"range": {"field": "timestamp", "ranges": agg_ranges}}},
+        )
+        counts = [bucket["doc_count"] for bucket in response["aggregations"]["buckets"]["buckets"]]
+        return list(zip(ranges, counts, strict=True))
+
+    def get_workload_census(self, client_id: str, workload_id: str) -> dict[str, Any]:
+        """
+        Describe a workload without transferring any of its records.
+
+        Returns:
+            Record count, date range, daily record counts, the share of tool-calling
+            records and the distinct tool signatures of the workload. Tool figures
+            only cover records fingerprinted at ingest time.
+        """
+        response = self.es_client.search(**census_search_kwargs(client_id, workload_id))
+        return parse_census_response(client_id, workload_id, response)
+
+    def update_snapshot(self, client_id: str, workload_id: str) -> RecordSnapshot:
+        """
+        Bring the local snapshot of a workload up to date.
+
+        Only the records at or after the snapshot high-water mark are pulled from
+        Elasticsearch, so the cost of a repeated export scales with the new traffic.
+        The first export of a workload pulls its full history. The pages are streamed
+        straight into the snapshot file, newest first, so memory stays bounded by the
+        page size; the walk is therefore never sliced, as slices interleave their pages.
+        """
+        snapshot = RecordSnapshot(self.export_config.snapshot_dir, client_id, workload_id)
+        with snapshot.lock():
+            mark = snapshot.mark()
+            timestamp_range = {"gte": mark.high_water_mark} if mark is not None else None
+            query = workload_query(client_id, workload_id, timestamp_range)
+
+            new_hits = (
+                (hit["_id"], hit["sort"][0], hit["_source"])
+                for hits in self._iter_hit_pages(query, NEWEST_FIRST, sliced=False)
+                for hit in hits
+            )
+            snapshot.update(new_hits, mark)
+
+        return snapshot
 
     def get_records(
         self, client_id: str, workload_id: str, split_config: DataSplitConfig
     ) -> list[dict]:
         logger.info(f"Pulling data from Elasticsearch for workload {workload_id}")
-        # Define the search query
-        search_query = {
-            "query": {
-                "bool": {
-                    "must": [
-                        {"match": {"client_id": client_id}},
-                        {"match": {"workload_id": workload_id}},
-                    ]
-                }
-            },
-            "sort": [{"timestamp": {"order": "desc"}}],
-            "size": split_config.limit * 2,  # fetch more as some might get dropped in validation
-        }
 
-        # Execute the search query
-        response = self.es_client.search(index=ES_COLLECTION_NAME, body=search_query)
+        # fetch more as some might get dropped in validation
+        max_records = split_config.limit * 2
+
+        if self.export_config.snapshot_dir:
+            snapshot = self.update_snapshot(client_id, workload_id)
+            records_iter = islice(snapshot.iter_records(), max_records)
+        elif self.export_config.sampling == "random":
+            # The sample is drawn server side, so only transfer what the dataset needs
+            num_records = math.ceil(split_config.limit * self.export_config.sample_oversampling)
+            records_iter = chain.from_iterable(
+                self.iter_sampled_pages(
+                    client_id, workload_id, num_records, seed=split_config.random_seed
+                )
+            )
+        else:
+            records_iter = chain.from_iterable(
+                self.iter_record_pages(client_id, workload_id, max_records)
+            )
+
+        # Deduplicate records based on request.messages and response.choices
+        # while the pages stream in, so only unique records are kept in memory.
+        # The fingerprint is stored at ingest time, legacy records are hashed here.
+        unique_records = {}
+        num_records = 0
+        for record in records_iter:
+            num_records += 1
+            key = get_record_hash(record)
+            if key not in unique_records:
+                unique_records[key] = record
 
         # Check if any records were found
-        if not response["hits"]["hits"]:
+        if not num_records:
             msg = f"No records found for the given client_id {client_id} and workload_id {workload_id}"
             logger.error(msg)
             raise ValueError(msg)
 
-        # Extract the records
-        records = [hit["_source"] for hit in response["hits"]["hits"]]
         logger.info(
-            f"Found {len(records)} records for client_id {client_id} and workload_id {workload_id}"
+            f"Found {num_records} records for client_id {client_id} and workload_id {workload_id}"
         )
 
-        # Deduplicate records based on request.messages and response.choices
-        unique_records = {}
-        for record in records:
-            # Convert dictionaries to JSON strings for hashing
-            messages_str = json.dumps(record.get("request", {}).get("messages", []), sort_keys=True)
-            choices_str = json.dumps(record.get("response", {}).get("choices", []), sort_keys=True)
-            key = (messages_str, choices_str)
-            if key not in unique_records:
-                unique_records[key] = record
-
-        # Update records with deduplicated records
         records = list(unique_records.values())
 
         logger.info(f"Deduplicated down to {len(records)} records for workload {workload_id}")
 
         return records
+
+
+class AsyncRecordExporter:
+    """
+    Async counterpart of RecordExporter for queries made from the API.
+
+    Uses the app-wide AsyncElasticsearch client so previews and workload checks
+    do not block the event loop.
+    """
+
+    es_client: AsyncElasticsearch
+    export_config: ExportConfig
+
+    def __init__(self, export_config: ExportConfig | None = None):
+        self.es_client = get_async_es_client()
+        self.export_config = export_config or settings.export_config
+
+    async def get_workload_census(self, client_id: str, workload_id: str) -> dict[str, Any]:
+        """Describe a workload without transferring any of its records, see RecordExporter."""
+        response = await self.es_client.search(**census_search_kwargs(client_id, workload_id))
+        return parse_census_response(client_id, workload_id, response)
+
+    async def preview_records(
+        self, client_id: str, workload_id: str, size: int = 10
+    ) -> list[dict[str, Any]]:
+        """Get the newest records of a workload, projected like exported records."""
+        response = await self.es_client.search(
+            index=ES_COLLECTION_NAME,
+            query=workload_query(client_id, workload_id),
+            sort=[{"timestamp": {"order": "desc"}}],
+            size=size,
+            source=source_filter(self.export_config),
+            track_total_hits=False,
+        )
+        return [hit["_source"] for hit in response["hits"]["hits"]]
+
+
+def _allocate(total: int, counts: list[int | None]) -> list[int]:
+    """Split `total` across strata proportionally to their counts (largest remainder)."""
+    if len(counts) == 1:
+        return [total]
+
+    population = sum(count or 0 for count in counts)
+    if population == 0:
+        return [0] * len(counts)
+
+    total = min(total, population)
+    shares = [total * (count or 0) / population for count in counts]
+    allocations = [int(share) for share in shares]
+    by_remainder = sorted(
+        range(len(shares)), key=lambda i: shares[i] - allocations[i], reverse=True
+    )
+    for i in by_remainder[: total - sum(allocations)]:
+        allocations[i] += 1
+    return allocations
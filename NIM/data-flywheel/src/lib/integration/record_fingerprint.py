@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Canonical fingerprints used to deduplicate and describe logged records.
+
+The fingerprints are computed once when a record is indexed and stored next to it
+as keyword fields, so the export and validation steps can deduplicate with set
+lookups instead of re-serialising every document, and workloads can be described
+with aggregations. Records indexed before the fields existed are fingerprinted on
+the fly with the same functions.
+"""
+
+import hashlib
+from typing import Any
+
+from src.lib.flywheel import codec
+
+RECORD_HASH_FIELD = "record_hash"
+QUERY_HASH_FIELD = "query_hash"
+TOOL_SIGNATURE_FIELD = "tool_signature"
+
+
+def _digest(value: Any) -> str:
+    """Hash a JSON-serialisable value independently of its dict key order."""
+    return hashlib.blake2b(codec.canonical_dumpb(value), digest_size=16).hexdigest()
+
+
+def compute_record_hash(record: dict[str, Any]) -> str:
+    """Fingerprint of a record's request.messages and response.choices."""
+    messages = record.get("request", {}).get("messages", [])
+    choices = record.get("response", {}).get("choices", [])
+    return _digest([messages, choices])
+
+
+def compute_query_hash(record: dict[str, Any]) -> str | None:
+    """
+    Fingerprint of the user messages of a record.
+
+    Returns:
+        The hash of the ordered user message contents, or None if the record has
+        no identifiable user messages (such records are never deduplicated)
+    """
+    try:
+        messages = record.get("request", {}).get("messages", [])
+        if not isinstance(messages, list):
+            return None
+
+        user_messages = [
+            msg["content"]
+            for msg in messages
+            if isinstance(msg, dict) and msg.get("role") == "user" and msg.get("content")
+        ]
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+    return _digest(user_messages) if user_messages else None
+
+
+def compute_tool_signature(record: dict[str, Any]) -> str | None:
+    """
+    Signature of the tools called in a record's response.
+
+    Returns:
+        The sorted, comma separated names of the called functions, or None if the
+        response has no tool calls
+    """
+    try:
+        names = {
+            tool_call["function"]["name"]
+            for choice in record.get("response", {}).get("choices", [])
+            for tool_call in choice.get("message", {}).get("tool_calls") or []
+        }
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+    return ",".join(sorted(names)) if names else None
+
+
+def _without_conversation(record: dict[str, Any]) -> dict[str, Any]:
+    """A record without the request messages and response choices covered by its hash."""
+    request = {key: value for key, value in record.get("request", {}).items() if key != "messages"}
+    response = {key: value for key, value in record.get("response", {}).items() if key != "choices"}
+    return {**record, "request": request, "response": response}
+
+
+def compute_records_digest(records: list[dict[str, Any]]) -> bytes:
+    """
+    Concatenated fingerprints of the full contents of records, 16 bytes per record.
+
+    Unlike the record hash this covers every field of a record, so it changes whenever
+    anything that ends up in a dataset does. The messages and choices, the bulk of a
+    record, enter through the record hash stored at ingest, so only the remaining
+    fields are serialised here.
+    """
+    digests = []
+    for record in records:
+        hasher = hashlib.blake2b(get_record_hash(record).encode("utf-8"), digest_size=16)
+        hasher.update(b"\n")
+        hasher.update(codec.canonical_dumpb(_without_conversation(record)))
+        digests.append(hasher.digest())
+    return b"".join(digests)
+
+
+def add_fingerprints(record: dict[str, Any]) -> dict[str, Any]:
+    """Store the fingerprints on a record about to be indexed."""
+    record[RECORD_HASH_FIELD] = compute_record_hash(record)
+    query_hash = compute_query_hash(record)
+    if query_hash is not None:
+        record[QUERY_HASH_FIELD] = query_hash
+    tool_signature = compute_tool_signature(record)
+    if tool_signature is not None:
+        record[TOOL_SIGNATURE_FIELD] = tool_signature
+    return record
+
+
+def get_record_hash(record: dict[str, Any]) -> str:
+    """Return the stored record fingerprint, computing it for legacy records."""
+    return record.get(RECORD_HASH_FIELD) or compute_record_hash(record)
+
+
+def get_query_hash(record: dict[str, Any]) -> str | None:
+    """Return the stored query fingerprint, computing it for legacy records."""
+    return record.get(QUERY_HASH_FIELD) or compute_query_hash(record)
@@ -0,0 +1,189 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, suppress
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, NamedTuple
+
+from src.lib.flywheel import codec
+from src.log_utils import setup_logging
+
+logger = setup_logging("data_flywheel.record_snapshot")
+
+
+class SnapshotMark(NamedTuple):
+    """Where a snapshot ends: the newest sort value and the record ids stored at it."""
+
+    high_water_mark: int
+    ids_at_mark: frozenset[str]
+
+
+class RecordSnapshot:
+    """
+    Local on-disk snapshot of the exported records of one (client_id, workload_id).
+
+    The records are kept newest first in a gzip compressed JSONL file, next to a small
+    JSON metadata file holding the high-water mark: the sort value (epoch millis) of
+    the newest exported `timestamp`, and the ids of the records stored at exactly that
+    value. Repeated exports fetch the records at or after the mark, skip the ids
+    already stored and stream the rest in front of the snapshot.
+
+    Updates of one snapshot are serialised with an exclusive lock on a lock file next
+    to it, and every update writes to its own temporary files before replacing the
+    snapshot, so concurrent exports of a workload cannot corrupt it.
+    """
+
+    def __init__(self, base_dir: str | Path, client_id: str, workload_id: str):
+        self.client_id = client_id
+        self.workload_id = workload_id
+
+        # Hash the identifiers so they are always safe to use as a file name
+        key = hashlib.sha256(f"{client_id}\0{workload_id}".encode()).hexdigest()[:32]
+        base_dir = Path(base_dir)
+        self.records_path = base_dir / f"{key}.jsonl.gz"
+        self.meta_path = base_dir / f"{key}.json"
+        self.lock_path = base_dir / f"{key}.lock"
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Hold the exclusive update lock of the snapshot."""
+        self.records_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def mark(self) -> SnapshotMark | None:
+        """
+        Get the mark of the snapshot, None if there is no usable snapshot.
+
+        The metadata records the size of the records file it describes, so a snapshot
+        whose update was interrupted between replacing the two files is discarded
+        rather than served with a stale mark.
+        """
+        if not self.meta_path.exists() or not self.records_path.exists():
+            return None
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta.get("records_size") != self.records_path.stat().st_size:
+                logger.warning(f"Discarding inconsistent snapshot {self.records_path}")
+                return None
+            return SnapshotMark(meta["high_water_mark"], frozenset(meta.get("ids_at_mark", [])))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable snapshot metadata {self.meta_path}: {e}")
+            return None
+
+    def iter_records(self) -> Iterator[dict[str, Any]]:
+        """Lazily read the snapshot records, newest first."""
+        for line in self._iter_lines():
+            yield codec.loads(line)
+
+    def _iter_lines(self) -> Iterator[bytes]:
+        if not self.records_path.exists():
+            return
+        with gzip.open(self.records_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+    def update(
+        self, new_hits: Iterable[tuple[str, int, dict[str, Any]]], mark: SnapshotMark | None
+    ) -> int:
+        """
+        Stream newly exported records in front of the snapshot and move the mark.
+
+        Must be called while holding `lock()`, with the mark read under the same lock.
+
+        Args:
+            new_hits: (record id, sort value, record) of the records at or after the
+                mark, newest first. Records whose id is stored at the mark are skipped
+            mark: The current mark, None to replace the snapshot entirely
+
+        Returns:
+            The number of records added
+        """
+        stored_mark, stored_ids = mark if mark is not None else (None, frozenset())
+        high_water_mark, ids_at_mark = stored_mark, set(stored_ids)
+        num_new = 0
+
+        records_tmp = self._temporary_file(".jsonl.gz.tmp")
+        try:
+            with records_tmp, gzip.open(records_tmp, "wb") as out:
+                for record_id, sort_value, record in new_hits:
+                    if sort_value == stored_mark and record_id in stored_ids:
+                        continue
+                    if high_water_mark is None or sort_value > high_water_mark:
+                        high_water_mark, ids_at_mark = sort_value, set()
+                    if sort_value == high_water_mark:
+                        ids_at_mark.add(record_id)
+                    out.write(codec.dumpb(record) + b"\n")
+                    num_new += 1
+
+                num_records = num_new
+                if num_new and mark is not None:
+                    for line in self._iter_lines():
+                        out.write(line)
+                        num_records += 1
+
+            if not num_new:
+                os.unlink(records_tmp.name)
+                logger.info(f"Snapshot for workload {self.workload_id} is up to date")
+                return 0
+            os.replace(records_tmp.name, self.records_path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(records_tmp.name)
+            raise
+
+        # The metadata is written last and records the size of the file it describes:
+        # if the process dies in between, the next run sees the mismatch and rebuilds
+        meta = {
+            "client_id": self.client_id,
+            "workload_id": self.workload_id,
+            "high_water_mark": high_water_mark,
+            "ids_at_mark": sorted(ids_at_mark),
+            "num_records": num_records,
+            "records_size": self.records_path.stat().st_size,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        meta_tmp = self._temporary_file(".json.tmp")
+        with meta_tmp:
+            meta_tmp.write(json.dumps(meta).encode("utf-8"))
+        os.replace(meta_tmp.name, self.meta_path)
+
+        logger.info(
+            f"Snapshot for workload {self.workload_id} updated with {num_new} new records, "
+            f"{num_records} records in total"
+        )
+        return num_new
+
+    def _temporary_file(self, suffix: str) -> IO[bytes]:
+        # A unique file per update, in the snapshot directory so os.replace stays atomic
+        return tempfile.NamedTemporaryFile(
+            dir=self.records_path.parent,
+            prefix=self.records_path.name.split(".")[0] + ".",
+            suffix=suffix,
+            delete=False,
+        )
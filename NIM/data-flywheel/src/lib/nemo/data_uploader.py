@@ -14,7 +14,7 @@
 # limitations under the License.
 import io
 import os
-from typing import Any
+from typing import Any, BinaryIO
 
 import requests
 from huggingface_hub import HfApi
@@ -132,14 +132,15 @@ class DataUploader:
 
     def upload_data(
         self,
-        data: str,
+        data: str | bytes | BinaryIO,
         file_path: str,
     ) -> str:
         """
-        Upload a string as a file in the repository.
+        Upload a string, UTF-8 encoded bytes or a binary file object as a file in the repository.
 
         Args:
-            data: The string to upload
+            data: The string or bytes to upload, or a binary file object that is read
+                from its start
             file_path: The path to the file in the repository
 
         Returns:
@@ -151,7 +152,11 @@ class DataUploader:
             self._create_namespaces()
             self.repo_id = self._create_repo()
 
-        data_io = io.BytesIO(data.encode("utf-8"))
+        if isinstance(data, str | bytes):
+            data_io = io.BytesIO(data.encode("utf-8") if isinstance(data, str) else data)
+        else:
+            data_io = data
+            data_io.seek(0)
 
         # Upload file
         self.hf_api.upload_file(
@@ -200,6 +205,28 @@ class DataUploader:
 
         return dataset_obj
 
+    def dataset_exists(self) -> bool:
+        """
+        Check that the dataset is registered in the entity store and its repository
+        exists in the data store, e.g. before reusing it.
+
+        Returns:
+            True if both exist, False if either is missing or cannot be checked
+        """
+        repo_id = f"{self.namespace}/{self.dataset_name}"
+        try:
+            res = requests.get(
+                url=f"{self.entity_host}/v1/datasets/{self.namespace}/{self.dataset_name}"
+            )
+            if res.status_code != 200:
+                return False
+            if res.json().get("files_url") != f"hf://datasets/{repo_id}":
+                return False
+            return self.hf_api.repo_exists(repo_id=repo_id, repo_type="dataset")
+        except Exception as e:
+            logger.warning(f"Failed to check whether dataset {repo_id} exists: {e}")
+            return False
+
     def register_dataset(self, description: str = "", project: str = "flywheel") -> dict[str, Any]:
         """
         Register the dataset with the entity store after all files are uploaded.
@@ -16,6 +16,8 @@ import argparse
 import json
 import os
 import sys
+import time
+from collections.abc import Iterator
 from datetime import datetime
 from typing import Any
 
@@ -25,12 +27,17 @@ src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, project_root)
 sys.path.insert(0, src_dir)
 
-from lib.integration.es_client import ES_COLLECTION_NAME, get_es_client  # noqa: E402
+from elasticsearch import helpers  # noqa: E402
 
+from lib.integration.es_client import ES_COLLECTION_NAME, get_es_client  # noqa: E402
+from lib.integration.record_fingerprint import add_fingerprints  # noqa: E402
 from src.scripts.utils import validate_path  # noqa: E402
 
 ES_CLIENT = get_es_client()
 
+LOAD_MODES = ("streaming", "parallel", "single")
+REFRESH_POLICIES = ("end", "wait_for", "false")
+
 
 def create_openai_request_response(data: dict[str, Any]) -> dict[str, Any]:
     """Transform the data into an OpenAI-style request/response pair."""
@@ -72,64 +79,141 @@ def create_openai_request_response(data: dict[str, Any]) -> dict[str, Any]:
     return {"timestamp": timestamp, "request": request, "response": response}
 
 
+def iter_documents(
+    file_path: str, workload_id: str = "", client_id: str = ""
+) -> Iterator[dict[str, Any]]:
+    """Lazily read a JSONL file and yield documents ready to be indexed."""
+    log_format = None
+    with open(file_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+
+            # The format is decided by the first document of the file
+            if log_format is None:
+                log_format = bool(item.get("workload_id"))
+                if log_format:
+                    print("Document is already in the log format. Loading with overrides.")
+
+            if log_format:
+                # Document is already in the correct log format. However, for repeatable
+                # integration tests we want the ability to override the `workload_id`
+                # and `client_id` so that search queries scoped to those dynamic values
+                # will find the freshly-loaded records. When callers provide non-empty
+                # workload_id/client_id arguments we overwrite the existing values.
+
+                # Ensure we do not mutate the original dict across iterations
+                doc = dict(item)
+
+                # Override identifiers if provided by caller. This allows the
+                # integration tests to generate unique IDs while reusing a static
+                # JSONL fixture on disk.
+                if workload_id:
+                    doc["workload_id"] = workload_id
+                if client_id:
+                    doc["client_id"] = client_id
+            else:
+                # Document is not in the correct format, so we need to transform it
+                # into an OpenAI-style request/response pair
+                doc = create_openai_request_response(item)
+
+                doc["workload_id"] = workload_id
+
+                if client_id:
+                    doc["client_id"] = client_id
+
+            # Fingerprint at ingest time so exports can deduplicate without re-hashing
+            add_fingerprints(doc)
+
+            yield doc
+
+
 def load_data_to_elasticsearch(
     workload_id: str = "",
     client_id: str = "",
     file_path: str = "aiva_primary_assistant_dataset.jsonl",
     index_name: str = ES_COLLECTION_NAME,
+    mode: str = "streaming",
+    chunk_size: int = 500,
+    thread_count: int = 4,
+    refresh: str = "end",
 ):
-    """Load test data from JSON file into Elasticsearch."""
+    """Load test data from JSON file into Elasticsearch.
+
+    Args:
+        workload_id: Workload ID to assign (or override) on every document
+        client_id: Client ID to assign (or override) on every document
+        file_path: JSONL file to load, relative paths are resolved against data/
+        index_name: Index to load the documents into
+        mode: "streaming" or "parallel" for the bulk helpers, "single" to index
+            one document per request
+        chunk_size: Number of documents sent per bulk request
+        thread_count: Number of threads used by the parallel bulk mode
+        refresh: "end" refreshes the index once after loading, "wait_for" makes every
+            bulk request wait for a refresh, "false" leaves refreshing to the caller
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"mode must be one of {LOAD_MODES}")
+    if refresh not in REFRESH_POLICIES:
+        raise ValueError(f"refresh must be one of {REFRESH_POLICIES}")
+
     # Initialize Elasticsearch client
     es = ES_CLIENT
 
     # Validate and get the safe path
     safe_path = validate_path(file_path, is_input=True, data_dir="data")
 
-    # Read the test data
-    with open(safe_path) as f:
-        test_data = [json.loads(line) for line in f]
-
-    if test_data and test_data[0].get("workload_id"):
-        # Document is already in the correct log format. However, for repeatable
-        # integration tests we want the ability to override the `workload_id`
-        # and `client_id` so that search queries scoped to those dynamic values
-        # will find the freshly-loaded records. When callers provide non-empty
-        # workload_id/client_id arguments we overwrite the existing values.
-
-        print("Document is already in the log format. Loading with overrides.")
-
-        for doc in test_data:
-            # Ensure we do not mutate the original dict across iterations
-            indexed_doc = dict(doc)
+    documents = iter_documents(safe_path, workload_id, client_id)
+    bulk_refresh = "wait_for" if refresh == "wait_for" else "false"
 
-            # Override identifiers if provided by caller. This allows the
-            # integration tests to generate unique IDs while reusing a static
-            # JSONL fixture on disk.
-            if workload_id:
-                indexed_doc["workload_id"] = workload_id
-            if client_id:
-                indexed_doc["client_id"] = client_id
-
-            es.index(index=index_name, document=indexed_doc)
+    start = time.perf_counter()
+    indexed = 0
+    failed = 0
+    if mode == "single":
+        for doc in documents:
+            es.index(index=index_name, document=doc, refresh=bulk_refresh)
+            indexed += 1
     else:
-        # Document is not in the correct format, so we need to transform it
-        for item in test_data:
-            # Create OpenAI-style request/response pair
-            doc = create_openai_request_response(item)
-
-            doc["workload_id"] = workload_id
+        actions = ({"_index": index_name, "_source": doc} for doc in documents)
+        if mode == "parallel":
+            results = helpers.parallel_bulk(
+                es,
+                actions,
+                thread_count=thread_count,
+                chunk_size=chunk_size,
+                raise_on_error=False,
+                refresh=bulk_refresh,
+            )
+        else:
+            results = helpers.streaming_bulk(
+                es,
+                actions,
+                chunk_size=chunk_size,
+                raise_on_error=False,
+                refresh=bulk_refresh,
+            )
 
-            if client_id:
-                doc["client_id"] = client_id
+        for ok, info in results:
+            if ok:
+                indexed += 1
+            else:
+                failed += 1
+                if failed == 1:
+                    print(f"Failed to index document: {info}", file=sys.stderr)
 
-            # Index the document
-            es.index(index=index_name, document=doc)
+    if refresh != "false":
+        # Flush the index to disk
+        es.indices.flush(index=index_name)
 
-    # Flush the index to disk
-    es.indices.flush(index=index_name)
+        # Refresh the index to make all operations performed since the last refresh available for search
+        es.indices.refresh(index=index_name)
 
-    # Refresh the index to make all operations performed since the last refresh available for search
-    es.indices.refresh(index=index_name)
+    elapsed = time.perf_counter() - start
+    rate = indexed / elapsed if elapsed > 0 else float(indexed)
+    print(f"Indexed {indexed} documents in {elapsed:.2f}s ({rate:.0f} docs/s), {failed} failed.")
+    if failed:
+        raise RuntimeError(f"{failed} documents failed to index into {index_name}")
 
     print("Data loaded successfully.")
 
@@ -142,6 +226,22 @@ if __name__ == "__main__":
     parser.add_argument("--file", help="Input JSONL file path (defaults based on workload-type)")
     parser.add_argument("--client-id", help="Optional client identifier")
     parser.add_argument("--index-name", default=ES_COLLECTION_NAME, help="Optional index name")
+    parser.add_argument(
+        "--mode",
+        choices=LOAD_MODES,
+        default="streaming",
+        help="Bulk ingestion mode, or 'single' for one request per document",
+    )
+    parser.add_argument("--chunk-size", type=int, default=500, help="Documents per bulk request")
+    parser.add_argument(
+        "--thread-count", type=int, default=4, help="Threads used by the parallel mode"
+    )
+    parser.add_argument(
+        "--refresh",
+        choices=REFRESH_POLICIES,
+        default="end",
+        help="When the loaded documents are made searchable",
+    )
 
     args = parser.parse_args()
 
@@ -150,4 +250,8 @@ if __name__ == "__main__":
         client_id=args.client_id,
         file_path=args.file,
         index_name=args.index_name,
+        mode=args.mode,
+        chunk_size=args.chunk_size,
+        thread_count=args.thread_count,
+        refresh=args.refresh,
     )
@@ -42,6 +42,7 @@ from src.config import DataSplitConfig, NIMConfig, settings
 from src.lib.flywheel.cancellation import FlywheelCancelledError, check_cancellation
 from src.lib.flywheel.cleanup_manager import CleanupManager
 from src.lib.flywheel.job_manager import FlywheelJobManager
+from src.lib.flywheel.tokenizer import get_token_counter
 from src.lib.flywheel.util import (
     identify_workload_type,
 )
@@ -92,12 +93,24 @@ def worker_shutdown(sig, how, exitcode, **kwargs):
         cleanup_manager.cleanup_all_running_resources()
 
 
+@signals.worker_init.connect
+def init_main_worker(**kwargs):
+    """Load the tokenizer once in the main worker process, before the pool is forked."""
+    # Forked pool processes inherit the loaded tokenizer instead of each loading its
+    # own. HF tokenizers disable their thread pool in forked children anyway; saying
+    # so up front avoids a warning from every child.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    get_token_counter().warm_up()
+
+
 @signals.worker_process_init.connect
 def init_worker(**kwargs):
     """Initialize database connection after worker process is forked."""
     global db_manager
     init_db()
     db_manager = get_db_manager()
+    # The tokenizer was loaded by init_main_worker; pools that do not fork from the
+    # main worker load it lazily on the first count
 
 
 @celery_app.task(name="tasks.initialize_workflow", pydantic=True)
@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+
+import pytest
+
+from src.lib.flywheel import codec
+
+PAYLOADS = [
+    {"messages": [{"role": "user", "content": 'Grüße, 你好 "quoted" \\ \n\t\u001f'}]},
+    {"logprob": 1e-05, "small": 1.5e-05, "tiny": 2.5e-06, "tinier": 1e-300, "denormal": 5e-324},
+    {"large": 1e16, "larger": 1.2345678901234568e17, "max": 1.7976931348623157e308},
+    {"decimal": 0.1, "third": 1 / 3, "whole": 100.0, "zero": -0.0, "edge": 9999999999999998.0},
+    [-1e-05, -1e-07, -1e22, 0.0001, 123456.789, True, False, None],
+    {"int": 2**63 - 1, "negative": -(2**63), "nested": {"b": [1, {"a": 1e-7}], "a": None}},
+    {"text": "e-mail 1e-05 and 2.5e-06 inside a string", "value": 3e-05},
+    {"big_int": 2**70, "float": 1e-05},
+    {1: "non-str key", "z": [], "y": {}},
+]
+
+
+@pytest.fixture
+def orjson_dumpb():
+    pytest.importorskip("orjson")
+    if codec.BACKEND != "orjson":
+        pytest.skip("orjson is older than 3.12")
+    return codec._orjson_dumpb
+
+
+@pytest.mark.parametrize("sort_keys", [False, True])
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_backends_are_byte_identical(orjson_dumpb, payload, sort_keys):
+    if sort_keys and isinstance(payload, dict) and 1 in payload:
+        pytest.skip("mixed key types cannot be sorted by the standard library")
+    assert orjson_dumpb(payload, sort_keys) == codec._stdlib_dumpb(payload, sort_keys)
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_non_finite_floats_are_rejected(value):
+    payload = {"a": [1, {"b": value}], "c": None}
+    with pytest.raises(ValueError):
+        codec._stdlib_dumpb(payload)
+    with pytest.raises(ValueError):
+        codec.dumpb(payload)
+
+
+def test_floats_round_trip():
+    values = [1e-05, 1.5e-05, 2.5e-06, 1e16, 1e-300, 0.1]
+    assert codec.loads(codec._stdlib_dumpb(values)) == values
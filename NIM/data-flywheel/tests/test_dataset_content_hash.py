@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from src.api.models import WorkloadClassification
+from src.config import ICLConfig, ProcessingConfig, settings
+from src.lib.integration import dataset_creator
+from src.lib.integration.chunked_executor import ChunkedExecutor
+from src.lib.integration.dataset_creator import DatasetCreator
+from src.lib.integration.record_fingerprint import add_fingerprints
+
+
+class FakeTokenCounter:
+    backend = "cl100k_base"
+
+    def resolved_backend(self) -> str:
+        return self.backend
+
+
+def make_record(i: int) -> dict:
+    return add_fingerprints(
+        {
+            "timestamp": 1_700_000_000 + i,
+            "request": {
+                "messages": [{"role": "user", "content": f"question {i}"}],
+                "tools": [{"type": "function", "function": {"name": "lookup"}}],
+            },
+            "response": {"choices": [{"message": {"role": "assistant", "content": f"{i}"}}]},
+        }
+    )
+
+
+@pytest.fixture
+def token_counter(monkeypatch):
+    counter = FakeTokenCounter()
+    monkeypatch.setattr(dataset_creator, "get_token_counter", lambda: counter)
+    return counter
+
+
+def content_hash(records: list[dict]) -> str:
+    creator = DatasetCreator(records, "0" * 24, "", "workload")
+    with ChunkedExecutor(ProcessingConfig(num_workers=1)) as executor:
+        return creator._content_hash(executor, WorkloadClassification.GENERIC)
+
+
+def test_tuning_settings_do_not_change_the_content_hash(monkeypatch, token_counter):
+    records = [make_record(i) for i in range(10)]
+    before = content_hash(records)
+
+    tuned = settings.icl_config.model_copy(
+        update={"tokenizer_threads": 16, "token_count_cache_size": 10, "tokenizer_cache_dir": "/x"}
+    )
+    monkeypatch.setattr(settings, "icl_config", tuned)
+
+    assert content_hash(records) == before
+
+
+def test_content_settings_change_the_content_hash(monkeypatch, token_counter):
+    records = [make_record(i) for i in range(10)]
+    before = content_hash(records)
+
+    token_counter.backend = "approximate"
+    approximated = content_hash(records)
+    token_counter.backend = "cl100k_base"
+
+    monkeypatch.setattr(settings, "icl_config", ICLConfig(max_examples=5))
+    more_examples = content_hash(records)
+
+    assert len({before, approximated, more_examples}) == 3
+
+
+def test_every_record_field_changes_the_content_hash(token_counter):
+    records = [make_record(i) for i in range(10)]
+    before = content_hash(records)
+
+    changed_tools = [make_record(i) for i in range(10)]
+    changed_tools[3]["request"]["tools"][0]["function"]["name"] = "search"
+    changed_answer = [make_record(i) for i in range(10)]
+    changed_answer[5]["response"]["choices"][0]["message"]["content"] = "other"
+    changed_answer[5] = add_fingerprints(changed_answer[5])
+
+    assert content_hash(changed_tools) != before
+    assert content_hash(changed_answer) != before
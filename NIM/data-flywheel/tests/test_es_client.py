@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from types import SimpleNamespace
+from typing import ClassVar
+
+import pytest
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import BadRequestError, NotFoundError
+
+from src.lib.integration import es_client
+
+
+def api_error(error_class, status: int):
+    meta = ApiResponseMeta(
+        status=status,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0.0,
+        node=NodeConfig("http", "localhost", 9200),
+    )
+    return error_class("illegal_argument_exception", meta, {})
+
+
+class FakeElasticsearch:
+    instances: ClassVar[list["FakeElasticsearch"]] = []
+    put_mapping_error: Exception | None = None
+    exists_error: Exception | None = None
+
+    def __init__(self, **kwargs):
+        self.closed = False
+        self.cluster = SimpleNamespace(health=lambda: {"status": "green"})
+        self.indices = SimpleNamespace(exists=self._exists, put_mapping=self._put_mapping)
+        FakeElasticsearch.instances.append(self)
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+
+    def _exists(self, index):
+        if self.exists_error is not None:
+            raise self.exists_error
+        return True
+
+    def _put_mapping(self, index, properties):
+        if self.put_mapping_error is not None:
+            raise self.put_mapping_error
+
+
+@pytest.fixture
+def fake_elasticsearch(monkeypatch):
+    FakeElasticsearch.instances = []
+    FakeElasticsearch.put_mapping_error = None
+    FakeElasticsearch.exists_error = None
+    monkeypatch.setattr(es_client, "Elasticsearch", FakeElasticsearch)
+    return FakeElasticsearch
+
+
+def test_conflicting_fingerprint_mapping_is_tolerated(fake_elasticsearch):
+    fake_elasticsearch.put_mapping_error = api_error(BadRequestError, 400)
+
+    client = es_client._bootstrap_client()
+
+    assert client is fake_elasticsearch.instances[0]
+    assert not client.closed
+
+
+def test_client_is_closed_when_bootstrap_fails(fake_elasticsearch):
+    fake_elasticsearch.exists_error = api_error(NotFoundError, 404)
+
+    with pytest.raises(NotFoundError):
+        es_client._bootstrap_client()
+
+    (client,) = fake_elasticsearch.instances
+    assert client.closed
@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from src.config import ICLConfig
+from src.lib.flywheel import util
+
+TOPICS = ["weather", "flights", "hotels", "trains", "restaurants", "museums", "concerts"]
+
+
+def make_record(query: str) -> dict:
+    return {
+        "request": {"messages": [{"role": "user", "content": query}]},
+        "response": {"choices": [{"message": {"role": "assistant", "content": "ok"}}]},
+    }
+
+
+def make_example(query: str) -> tuple[dict, str, int]:
+    return make_record(query), f"Example: {query}", 10
+
+
+def count_words(texts, buffer_percent=20):
+    return [len(text.split()) for text in texts]
+
+
+def test_retrieved_prompt_cache_stays_bounded(monkeypatch):
+    monkeypatch.setattr(util, "estimate_tokens_batch", count_words)
+    monkeypatch.setattr(util, "ICL_PROMPT_CACHE_SIZE", 4)
+    caches: list[util.ICLPromptCache] = []
+
+    class RecordingCache(util.ICLPromptCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            caches.append(self)
+
+    monkeypatch.setattr(util, "ICLPromptCache", RecordingCache)
+
+    examples = {
+        "no_tool": [
+            make_example(f"{a} and {b} in town {i}")
+            for i, (a, b) in enumerate(zip(TOPICS, TOPICS[1:] + TOPICS[:1], strict=True))
+        ]
+    }
+    records = [make_record(f"{TOPICS[i % 7]} {TOPICS[i * 3 % 7]} town {i % 5}") for i in range(200)]
+    config = ICLConfig(example_selection="bm25", max_examples=2)
+
+    icl_records = list(util.iter_icl_records(records, config, examples))
+
+    (cache,) = caches
+    assert len(icl_records) == len(records)
+    assert cache.num_built > 4
+    assert len(cache) <= 4
+
+
+def test_fitted_prompts_are_shared():
+    examples = [make_example(f"{topic} question") for topic in TOPICS]
+    cache = util.ICLPromptCache(examples)
+
+    assert cache.system_message((0, 1)) is cache.system_message((0, 1))
+    assert cache.header((0, 1)).endswith("Example: weather question\n\nExample: flights question")
+    assert len(cache) == 1
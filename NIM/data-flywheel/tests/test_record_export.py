@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from src.config import ExportConfig
+from src.lib.integration import record_exporter
+from src.lib.integration.record_exporter import RecordExporter
+
+
+class FakeElasticsearch:
+    """Point-in-time search over in-memory records, sorted by NEWEST_FIRST."""
+
+    def __init__(self, timestamps: list[int], num_slices: int):
+        # The newest records all live in slice 0, so every slice-local cut is wrong
+        ordered = sorted(timestamps, reverse=True)
+        self.docs = [
+            {"_id": str(doc), "timestamp": timestamp, "slice": 0 if doc < 20 else doc % num_slices}
+            for doc, timestamp in enumerate(ordered)
+        ]
+
+    def open_point_in_time(self, index, keep_alive):
+        return {"id": "pit"}
+
+    def close_point_in_time(self, id):
+        pass
+
+    def search(self, pit, query, sort, size, source, track_total_hits, **kwargs):
+        slice_spec = kwargs.get("slice")
+        search_after = kwargs.get("search_after")
+        docs = [doc for doc in self.docs if slice_spec is None or doc["slice"] == slice_spec["id"]]
+        hits = sorted(
+            (
+                {
+                    "_id": doc["_id"],
+                    "sort": [doc["timestamp"], -int(doc["_id"])],
+                    "_source": {"timestamp": doc["timestamp"]},
+                }
+                for doc in docs
+            ),
+            key=lambda hit: hit["sort"],
+            reverse=True,
+        )
+        if search_after is not None:
+            hits = [hit for hit in hits if hit["sort"] < search_after]
+        return {"pit_id": "pit", "hits": {"hits": hits[:size]}}
+
+
+@pytest.mark.parametrize("num_slices", [1, 3])
+@pytest.mark.parametrize("max_records", [10, 25, None])
+def test_recent_export_returns_the_globally_newest_records(monkeypatch, num_slices, max_records):
+    timestamps = [1_700_000_000_000 + (i * 7919) % 1000 for i in range(100)]
+    client = FakeElasticsearch(timestamps, num_slices)
+    monkeypatch.setattr(record_exporter, "get_es_client", lambda: client)
+    exporter = RecordExporter(ExportConfig(num_slices=num_slices, page_size=4))
+
+    pages = list(exporter.iter_record_pages("client", "workload", max_records))
+
+    exported = [record["timestamp"] for page in pages for record in page]
+    expected = sorted(timestamps, reverse=True)[:max_records]
+    assert exported == expected
+    assert all(len(page) <= 4 for page in pages)
@@ -0,0 +1,47 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+
+import pytest
+
+from src.config import ICLConfig
+from src.lib.flywheel import tokenizer
+from src.lib.flywheel.tokenizer import TokenCounter
+
+
+class FakeEncoding:
+    def encode_batch(self, texts, num_threads, disallowed_special):
+        return [text.split() for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_tiktoken(monkeypatch):
+    monkeypatch.setattr(tokenizer.tiktoken, "get_encoding", lambda name: FakeEncoding())
+
+
+def test_tokenizer_cache_dir_does_not_override_the_environment(monkeypatch):
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", "/operator/cache")
+    counter = TokenCounter(ICLConfig(tokenizer_cache_dir="/configured/cache"))
+
+    assert counter.count("two words") == 2
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == "/operator/cache"
+
+
+def test_tokenizer_cache_dir_is_used_when_the_environment_is_unset(monkeypatch):
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    counter = TokenCounter(ICLConfig(tokenizer_cache_dir="/configured/cache"))
+
+    assert counter.count("two words") == 2
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == "/configured/cache"
@@ -0,0 +1,73 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from src.api.schemas import WorkloadCensusResponse
+from src.lib.integration.record_exporter import parse_census_response
+
+
+def census_response(num_records: int, num_fingerprinted: int) -> dict:
+    """A census search response as Elasticsearch returns it for unmapped or absent fields."""
+    return {
+        "hits": {"total": {"value": num_records, "relation": "eq"}, "hits": []},
+        "aggregations": {
+            "first_record": {"value": 1.7e12, "value_as_string": "2025-11-14T22:13:20.000Z"},
+            "last_record": {"value": 1.7e12, "value_as_string": "2025-11-14T22:13:20.000Z"},
+            "fingerprinted": {"doc_count": num_fingerprinted},
+            "distinct_queries": {"value": 0},
+            "tool_calling": {"doc_count": 0},
+            "distinct_tool_signatures": {"value": 0},
+            "tool_signatures": {"buckets": []},
+            "records_per_day": {
+                "buckets": [{"key_as_string": "2025-11-14T00:00:00.000Z", "doc_count": num_records}]
+            },
+        },
+    }
+
+
+def test_census_without_fingerprints_reports_unknown():
+    census = WorkloadCensusResponse(
+        **parse_census_response("client", "workload", census_response(500, 0))
+    )
+
+    assert census.num_records == 500
+    assert census.num_fingerprinted_records == 0
+    assert census.num_distinct_queries is None
+    assert census.num_tool_calling_records is None
+    assert census.tool_calling_share is None
+    assert census.num_tool_signatures is None
+    assert census.tool_signatures is None
+    assert [day.num_records for day in census.records_per_day] == [500]
+
+
+def test_partially_fingerprinted_census_reports_unknown():
+    census = parse_census_response("client", "workload", census_response(500, 499))
+
+    assert census["num_distinct_queries"] is None
+    assert census["tool_calling_share"] is None
+
+
+def test_fingerprinted_census_reports_counts():
+    response = census_response(500, 500)
+    aggs = response["aggregations"]
+    aggs["distinct_queries"]["value"] = 420
+    aggs["tool_calling"]["doc_count"] = 300
+    aggs["distinct_tool_signatures"]["value"] = 1
+    aggs["tool_signatures"]["buckets"] = [{"key": "get_weather", "doc_count": 300}]
+
+    census = WorkloadCensusResponse(**parse_census_response("client", "workload", response))
+
+    assert census.num_distinct_queries == 420
+    assert census.num_tool_calling_records == 300
+    assert census.tool_calling_share == 0.6
+    assert [(s.signature, s.num_records) for s in census.tool_signatures] == [("get_weather", 300)]